@@ -0,0 +1,132 @@
+"""
+Seeded generator for synthetic python package trees.
+
+    python -m benchmarks.generate OUT_DIR --files 2000 --seed 1
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List
+
+import argparse
+import random
+
+
+@dataclass(frozen=True)
+class TreeSpec:
+    files: int = 500
+    # number of top-level packages, and subpackages per package
+    packages: int = 8
+    subpackages: int = 4
+    # mean number of imports per file
+    fan_out: float = 4.0
+    # fraction of imports written as relative imports when the target allows it
+    relative_fraction: float = 0.3
+    # fraction of imports that point "up" the module order, closing cycles
+    cycle_density: float = 0.05
+    # fraction of files with a `# Package:` annotation
+    annotated_fraction: float = 0.5
+    # fraction of imports nested inside a function rather than at top level
+    nested_fraction: float = 0.2
+    seed: int = 0
+
+
+def module_names(spec: TreeSpec) -> List[str]:
+    """
+    Assign every file a module name, spreading them evenly over the subpackages.
+    """
+    names = []
+    subpackages = spec.packages * spec.subpackages
+    for idx in range(spec.files):
+        sub = idx % subpackages
+        names.append(
+            f"pkg{sub // spec.subpackages}.sub{sub % spec.subpackages}.mod{idx}"
+        )
+    return names
+
+
+def import_statement(src: str, dst: str, relative: bool) -> str:
+    src_parts = src.split(".")
+    dst_parts = dst.split(".")
+    if relative and src_parts[0] == dst_parts[0]:
+        if src_parts[1] == dst_parts[1]:
+            return f"from .{dst_parts[2]} import VALUE"
+        return f"from ..{dst_parts[1]}.{dst_parts[2]} import VALUE"
+    if relative:
+        return f"from {'.'.join(dst_parts[:-1])} import {dst_parts[-1]}"
+    return f"import {dst}"
+
+
+def generate_tree(root: Path, spec: TreeSpec) -> List[Path]:
+    """
+    Write a synthetic tree described by `spec` under `root`, and return the paths of
+    the generated modules.
+
+    Modules are ordered, and most imports point to an earlier module, so the
+    import graph is a DAG apart from the `cycle_density` fraction of imports.
+    """
+    rng = random.Random(spec.seed)
+    names = module_names(spec)
+    package_names = [f"area{idx}" for idx in range(max(1, spec.packages // 2))]
+    paths = []
+
+    for package in set(".".join(name.split(".")[:-1]) for name in names):
+        for depth in (1, 2):
+            init_path = root.joinpath(*package.split(".")[:depth], "__init__.py")
+            init_path.parent.mkdir(parents=True, exist_ok=True)
+            init_path.touch()
+
+    for idx, name in enumerate(names):
+        lines = []
+        if rng.random() < spec.annotated_fraction:
+            lines.append(f"# Package: {rng.choice(package_names)}")
+        top_level = []
+        nested = []
+        for _ in range(int(rng.expovariate(1 / spec.fan_out)) if idx else 0):
+            if rng.random() < spec.cycle_density:
+                dst = names[rng.randrange(idx, len(names))]
+            else:
+                # favour nearby modules, so subpackages are cohesive
+                dst = names[max(0, idx - 1 - int(rng.expovariate(1 / 40)))]
+            if dst == name:
+                continue
+            statement = import_statement(
+                name, dst, rng.random() < spec.relative_fraction
+            )
+            if rng.random() < spec.nested_fraction:
+                nested.append(statement)
+            else:
+                top_level.append(statement)
+        lines.extend(top_level)
+        lines.append("")
+        lines.append(f"VALUE = {idx}")
+        lines.append("")
+        lines.append("")
+        lines.append("def f():")
+        for statement in nested:
+            lines.append(f"    {statement}")
+        lines.append(f"    return VALUE + {rng.randrange(1000)}")
+        path = root.joinpath(*name.split(".")).with_suffix(".py")
+        path.write_text("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", type=Path)
+    defaults = TreeSpec()
+    for field, value in vars(defaults).items():
+        parser.add_argument(
+            f"--{field.replace('_', '-')}", type=type(value), default=value
+        )
+    args = vars(parser.parse_args())
+    out_dir = args.pop("out_dir")
+    paths = generate_tree(out_dir, TreeSpec(**args))
+    print(f"wrote {len(paths)} files to {out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Time every subcommand and the main graph primitives on synthetic trees.
+
+    python -m benchmarks.run --sizes 200,1000,5000
+    python -m benchmarks.run --save-baseline
+    python -m benchmarks.run --check
+
+Each benchmark is run `--repeat` times and the best wall time is kept. Peak memory
+is measured with `tracemalloc` in one extra run. Results are compared against the
+stored JSON baseline, and any benchmark slower or larger than the baseline by more
+than `--tolerance` is flagged as a regression.
+"""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from click.testing import CliRunner
+
+from uncycle.graph import (
+    Graph,
+    feedback_arc_set,
+    generate_transitive_path_lookup,
+    package_cycle_paths,
+    strongly_connected_components,
+)
+from uncycle.main import cli
+from uncycle.parse_summary import ParseSummary, build_parse_summary
+
+from .generate import TreeSpec, generate_tree
+
+
+BASELINE_PATH = Path(__file__).parent / "baseline.json"
+
+DEFAULT_SIZES = [200, 1000, 5000]
+
+# benchmarks whose cost grows too quickly to run on every size
+MAX_SIZES = {
+    "graph.generate_transitive_path_lookup": 1000,
+    "cli.print_cycles_legacy": 1000,
+}
+
+CLI_COMMANDS: List[Tuple[str, List[str]]] = [
+    ("print_edges", []),
+    ("print_leafs", []),
+    ("print_missing_annotations", []),
+    ("print_dependency_graph", []),
+    ("print_virtual_dependency_graph", []),
+    ("dump_inline_packages", []),
+    ("print_cycles", []),
+    ("print_cycles_sccs", ["print_cycles", "-s"]),
+    ("print_cut_set", []),
+    ("print_cycles_legacy", []),
+    ("extract", ["extract", "new_pkg", "--auto"]),
+    ("print_path", ["print_path", "pkg0/sub0/mod0.py", "pkg0/sub1/mod1.py"]),
+    ("print_impacted", ["print_impacted", "pkg0/sub0/mod0.py"]),
+    ("print_dependencies", ["print_dependencies", "pkg0/sub0/mod0.py"]),
+    ("print_layers", []),
+    ("export_graph", []),
+    ("snapshot", ["snapshot", "-o", os.devnull]),
+]
+
+Benchmark = Tuple[str, Callable[[], object]]
+
+
+def graph_benchmarks(tree: Path, summary: ParseSummary) -> List[Benchmark]:
+    def parse() -> object:
+        return build_parse_summary(tree, [], top_level_only=False)
+
+    def from_edges() -> object:
+        return Graph.from_edges(summary.edges, summary.nodes)
+
+    graph = Graph.from_edges(summary.edges, summary.nodes)
+    path_to_package = summary.path_to_package()
+    packages = [path_to_package.get(name) for name in graph.names]
+    excluded = [False] * len(graph)
+
+    return [
+        ("parse.build_parse_summary", parse),
+        ("graph.from_edges", from_edges),
+        (
+            "graph.strongly_connected_components",
+            lambda: strongly_connected_components(graph),
+        ),
+        ("graph.feedback_arc_set", lambda: feedback_arc_set(graph)),
+        (
+            "graph.generate_transitive_path_lookup",
+            lambda: generate_transitive_path_lookup(summary.edges),
+        ),
+        (
+            "graph.package_cycle_paths",
+            lambda: sum(1 for _ in package_cycle_paths(graph, packages, excluded)),
+        ),
+    ]
+
+
+def cli_benchmarks(tree: Path) -> List[Benchmark]:
+    runner = CliRunner()
+
+    def command(args: List[str]) -> Callable[[], object]:
+        def run() -> object:
+            result = runner.invoke(cli, ["--directory", str(tree), *args])
+            if result.exit_code != 0:
+                raise RuntimeError(f"{args} failed: {result.output}")
+            return result
+
+        return run
+
+    return [
+        (f"cli.{name}", command(args or [name])) for name, args in CLI_COMMANDS
+    ]
+
+
+def measure(f: Callable[[], object], repeat: int) -> Dict[str, float]:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        f()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        f()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(best, 6), "peak_kib": round(peak / 1024, 1)}
+
+
+def run_benchmarks(
+    sizes: List[int], spec: TreeSpec, repeat: int, pattern: str
+) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            tree = Path(tmp)
+            generate_tree(tree, replace(spec, files=size))
+            summary = build_parse_summary(tree, [], top_level_only=False)
+            for name, f in graph_benchmarks(tree, summary) + cli_benchmarks(tree):
+                if size > MAX_SIZES.get(name, size) or not fnmatch.fnmatch(
+                    name, pattern
+                ):
+                    continue
+                key = f"{name}@{size}"
+                results[key] = measure(f, repeat)
+                print(
+                    f"{key:50s} {results[key]['seconds']:10.4f}s "
+                    f"{results[key]['peak_kib']:12.1f} KiB"
+                )
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float,
+) -> List[str]:
+    """
+    Return a description of each result that regressed against the baseline.
+    """
+    regressions = []
+    for key, result in sorted(results.items()):
+        prior = baseline.get(key)
+        if prior is None:
+            continue
+        for metric in ("seconds", "peak_kib"):
+            # ignore noise on very small numbers
+            floor = 0.005 if metric == "seconds" else 64
+            if result[metric] > max(prior[metric], floor) * (1 + tolerance):
+                regressions.append(
+                    f"{key}: {metric} {prior[metric]} -> {result[metric]}"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        type=lambda s: [int(n) for n in s.split(",")],
+        default=DEFAULT_SIZES,
+        help="comma-separated file counts of the generated trees",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--filter", default="*", help="only run benchmarks matching this glob"
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="exit with status 1 if any benchmark regressed",
+    )
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        args.sizes, TreeSpec(seed=args.seed), args.repeat, args.filter
+    )
+    report = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.json is not None:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"saved baseline to {args.baseline}")
+        return 0
+
+    if not args.baseline.exists():
+        print(f"no baseline at {args.baseline}")
+        return 0
+    baseline = json.loads(args.baseline.read_text())["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if not regressions:
+        print("no regressions")
+    return 1 if regressions and args.check else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
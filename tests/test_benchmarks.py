@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from benchmarks.generate import TreeSpec, generate_tree
+from benchmarks.run import compare
+from uncycle.graph import Graph, strongly_connected_components
+from uncycle.parse_summary import build_parse_summary
+
+
+def test_generate_tree(tmp_path: Path):
+    spec = TreeSpec(files=100, cycle_density=0.2, seed=3)
+    paths = generate_tree(tmp_path / "a", spec)
+    assert len(paths) == 100
+    generate_tree(tmp_path / "b", spec)
+    for path in paths:
+        other = tmp_path / "b" / path.relative_to(tmp_path / "a")
+        assert path.read_text() == other.read_text()
+
+    summary = build_parse_summary(tmp_path / "a", [], top_level_only=False)
+    assert len(summary.edges) > 100
+    graph = Graph.from_edges(summary.edges, summary.nodes)
+    assert any(len(scc) > 1 for scc in strongly_connected_components(graph))
+    packages = set(summary.path_to_package().values())
+    assert None in packages and len(packages) > 1
+
+    acyclic = TreeSpec(files=100, cycle_density=0, seed=3)
+    generate_tree(tmp_path / "c", acyclic)
+    summary = build_parse_summary(tmp_path / "c", [], top_level_only=False)
+    graph = Graph.from_edges(summary.edges, summary.nodes)
+    assert all(len(scc) == 1 for scc in strongly_connected_components(graph))
+
+
+def test_compare():
+    baseline = {
+        "a@10": {"seconds": 1.0, "peak_kib": 1000},
+        "b@10": {"seconds": 0.0001, "peak_kib": 1},
+    }
+    results = {
+        "a@10": {"seconds": 1.5, "peak_kib": 1100},
+        "b@10": {"seconds": 0.002, "peak_kib": 10},
+        "c@10": {"seconds": 9.0, "peak_kib": 1},
+    }
+    assert compare(results, baseline, 0.25) == ["a@10: seconds 1.0 -> 1.5"]
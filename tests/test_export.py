@@ -0,0 +1,105 @@
+from xml.etree import ElementTree
+
+import io
+import json
+
+from uncycle.export import build_export_graph, write_dot, write_graphml, write_json
+from uncycle.graph import Graph
+
+
+EDGES = sorted(
+    [("a", "b"), ("b", "a"), ("b", "c"), ("c", "a"), ("c", "d"), ("d", "e")]
+)
+PACKAGES = {"a": "p", "b": "p", "d": "q", "e": "q"}
+
+
+def edge_names(export):
+    return [
+        (export.names[src], export.names[dst], weight)
+        for src, dst, weight in export.edges()
+    ]
+
+
+def test_build_export_graph():
+    graph = Graph.from_edges(EDGES + [("a", "e")], nodes=["f"])
+    export, nodes, edges = build_export_graph(graph, PACKAGES)
+    assert (nodes, edges, export.edge_count) == (6, 7, 7)
+    assert export.names == ["a", "b", "c", "d", "e", "f"]
+    assert export.clusters == ["p", "p", None, "q", "q", None]
+    assert edge_names(export) == [(*edge, 1) for edge in sorted(EDGES + [("a", "e")])]
+
+    export, _, _ = build_export_graph(graph, PACKAGES, packages=True)
+    assert export.names == ["c", "f", "p", "q"]
+    assert edge_names(export) == [
+        ("c", "p", 1),
+        ("c", "q", 1),
+        ("p", "c", 1),
+        ("p", "q", 1),
+    ]
+
+    export, nodes, edges = build_export_graph(graph, PACKAGES, only="sccs")
+    assert (nodes, edges, export.edge_count) == (3, 4, 4)
+    assert export.names == ["a", "b", "c"]
+    assert edge_names(export) == [(*edge, 1) for edge in EDGES[:4]]
+    export, _, _ = build_export_graph(graph, PACKAGES, only="cycles")
+    assert edge_names(export) == [
+        ("a", "b", 1),
+        ("b", "a", 1),
+        ("b", "c", 1),
+        ("c", "a", 1),
+    ]
+
+    # a and b have the most edges, then c
+    export, nodes, edges = build_export_graph(graph, {}, max_nodes=3, max_edges=3)
+    assert (nodes, edges, export.edge_count) == (6, 7, 3)
+    assert export.names == ["a", "b", "c"]
+    assert edge_names(export) == [("a", "b", 1), ("b", "a", 1), ("b", "c", 1)]
+
+
+def test_writers():
+    graph = Graph.from_edges([("a", 'x"y'), ("b", "a"), ("c", "a")])
+    export, _, _ = build_export_graph(graph, {"b": "p", "c": "p"}, packages=True)
+    assert edge_names(export) == [("a", 'x"y', 1), ("p", "a", 2)]
+    export.clusters = [None, "<q>", None]
+
+    out = io.StringIO()
+    write_dot(export, out)
+    assert out.getvalue() == (
+        "digraph uncycle {\n"
+        "  subgraph cluster_0 {\n"
+        '    label="<q>";\n'
+        '    "p";\n'
+        "  }\n"
+        '  "a";\n'
+        '  "x\\"y";\n'
+        '  "a" -> "x\\"y";\n'
+        '  "p" -> "a" [weight=2, label="2"];\n'
+        "}\n"
+    )
+
+    out = io.StringIO()
+    write_json(export, out)
+    assert json.loads(out.getvalue()) == {
+        "nodes": [
+            {"id": "a", "package": None},
+            {"id": "p", "package": "<q>"},
+            {"id": 'x"y', "package": None},
+        ],
+        "edges": [
+            {"source": "a", "target": 'x"y', "weight": 1},
+            {"source": "p", "target": "a", "weight": 2},
+        ],
+    }
+
+    out = io.StringIO()
+    write_graphml(export, out)
+    namespace = {"g": "http://graphml.graphdrawing.org/xmlns"}
+    root = ElementTree.fromstring(out.getvalue())
+    nodes = root.findall("g:graph/g:node", namespace)
+    assert [node.get("id") for node in nodes] == ["a", "p", 'x"y']
+    assert nodes[1].find("g:data", namespace).text == "<q>"
+    edges = root.findall("g:graph/g:edge", namespace)
+    assert [
+        (edge.get("source"), edge.get("target"), edge.find("g:data", namespace).text)
+        for edge in edges
+    ] == [("a", 'x"y', "1"), ("p", "a", "2")]
@@ -0,0 +1,24 @@
+from uncycle.extract import PeelState
+from uncycle.file_metadata import FileMetadata
+from uncycle.graph import Graph
+
+
+def test_peel_state():
+    nodes = ["a.py", "b.py", "c.py", "d.py"]
+    edges = [("a.py", "b.py"), ("a.py", "c.py"), ("b.py", "c.py"), ("d.py", "a.py")]
+    graph = Graph.from_edges(edges, nodes)
+    metadata = {node: FileMetadata(1, None) for node in nodes}
+    state = PeelState(graph, {}, "new", {"new"}, {"new"}, metadata)
+    assert state.potential_nodes == ["c.py"]
+    state.move("c.py")
+    assert state.potential_nodes == ["b.py"]
+    assert state.path_to_package == {"c.py": "new"}
+    state.reject("b.py")
+    assert state.potential_nodes == []
+
+    state = PeelState(graph, {"b.py": "new"}, "new", {"new"}, {"new"}, metadata)
+    assert state.potential_nodes == ["c.py"]
+    state.move("c.py")
+    assert state.potential_nodes == ["a.py"]
+    state.move("a.py")
+    assert state.potential_nodes == ["d.py"]
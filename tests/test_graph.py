@@ -0,0 +1,185 @@
+from uncycle.graph import (
+    Graph,
+    ReachabilityIndex,
+    all_shortest_paths,
+    edges_to_adjacency_list,
+    elementary_cycles,
+    feedback_arc_set,
+    layers,
+    package_cycle_paths,
+    remap_edges,
+    shortest_cycle_through,
+    shortest_cycles,
+    shortest_path,
+    strongly_connected_components,
+)
+
+
+EDGES = sorted(
+    [("a", "b"), ("b", "a"), ("b", "c"), ("c", "a"), ("c", "d"), ("d", "e")]
+)
+
+
+def names(graph, nodes):
+    return [graph.names[node] for node in nodes]
+
+
+def test_graph():
+    graph = Graph.from_edges(EDGES + [("a", "b")], nodes=["f"])
+    assert graph.names == ["a", "b", "c", "d", "e", "f"]
+    assert graph.edge_count() == len(EDGES)
+    assert list(graph.edges()) == EDGES
+    assert graph.adjacency_list() == edges_to_adjacency_list(EDGES)
+    assert names(graph, graph.successors(graph.ids["b"])) == ["a", "c"]
+    assert names(graph, graph.predecessors(graph.ids["a"])) == ["b", "c"]
+    assert list(graph.reversed().edges()) == sorted((d, s) for s, d in EDGES)
+    assert graph.has_edge(graph.ids["c"], graph.ids["d"])
+    assert not graph.has_edge(graph.ids["d"], graph.ids["c"])
+
+    mapping = {"a": "p", "b": "p", "d": "q"}
+    for drop_missing in (True, False):
+        quotient = graph.quotient(mapping, drop_missing=drop_missing)
+        edges, reverse_lookup = remap_edges(EDGES, mapping, drop_missing=drop_missing)
+        assert list(quotient.edges()) == edges
+        assert sorted(reverse_lookup) == edges
+    assert reverse_lookup[("p", "c")] == [("b", "c")]
+    assert reverse_lookup[("q", "e")] == [("d", "e")]
+
+
+def test_strongly_connected_components():
+    graph = Graph.from_edges(EDGES)
+    sccs = [names(graph, scc) for scc in strongly_connected_components(graph)]
+    assert sccs == [["e"], ["d"], ["a", "b", "c"]]
+    sub_sccs = strongly_connected_components(graph, [graph.ids["a"], graph.ids["c"]])
+    assert [names(graph, scc) for scc in sub_sccs] == [["a"], ["c"]]
+
+
+def test_shortest_cycle_through():
+    graph = Graph.from_edges(EDGES)
+    members = {graph.ids[node] for node in "abc"}
+
+    def shortest_cycle(node, members):
+        return names(graph, shortest_cycle_through(graph, graph.ids[node], members))
+
+    assert shortest_cycle("a", members) == ["a", "b"]
+    assert shortest_cycle("b", members) == ["b", "a"]
+    assert shortest_cycle("c", members) == ["c", "a", "b"]
+    assert shortest_cycle("d", {graph.ids["d"]}) == []
+
+
+def test_shortest_cycles_and_path():
+    graph = Graph.from_edges(EDGES + [("e", "e")])
+    assert [names(graph, cycle) for cycle in shortest_cycles(graph)[0]] == [
+        ["e"],
+        ["a", "b"],
+        ["a", "b", "c"],
+    ]
+    # the searches through a, b and c visit 5, 4 and 5 edges
+    ring = Graph.from_edges([("a", "b"), ("b", "c"), ("c", "a"), ("c", "b")])
+    for max_visits, expected, unsearched in [
+        (None, [["b", "c"], ["a", "b", "c"]], 0),
+        (9, [["b", "c"], ["a", "b", "c"]], 1),
+        (8, [["a", "b", "c"]], 2),
+        (4, [], 3),
+    ]:
+        cycles, left = shortest_cycles(ring, None, max_visits)
+        assert ([names(ring, cycle) for cycle in cycles], left) == (
+            expected,
+            unsearched,
+        )
+
+    def path(src, dst):
+        return names(graph, shortest_path(graph, graph.ids[src], graph.ids[dst]))
+
+    assert path("a", "e") == ["a", "b", "c", "d", "e"]
+    assert path("c", "b") == ["c", "a", "b"]
+    assert path("a", "a") == ["a"]
+    assert path("e", "a") == []
+
+    graph = Graph.from_edges(
+        [("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("a", "e")]
+        + [("e", "f"), ("d", "f"), ("f", "g")]
+    )
+
+    def paths(src, dst, limit=None):
+        return [
+            names(graph, path)
+            for path in all_shortest_paths(graph, graph.ids[src], graph.ids[dst], limit)
+        ]
+
+    assert paths("a", "d") == [["a", "b", "d"], ["a", "c", "d"]]
+    assert paths("a", "g") == [["a", "e", "f", "g"]]
+    assert paths("b", "g") == [["b", "d", "f", "g"]]
+    assert paths("a", "d", limit=1) == [["a", "b", "d"]]
+    assert paths("g", "a") == []
+
+
+def test_reachability_index():
+    graph = Graph.from_edges(EDGES + [("e", "e"), ("f", "d")])
+    forward = ReachabilityIndex(graph)
+    backward = ReachabilityIndex(graph, reverse=True)
+
+    def reachable(index, nodes):
+        return names(graph, index.reachable(graph.ids[node] for node in nodes))
+
+    assert reachable(forward, "a") == ["a", "b", "c", "d", "e"]
+    assert reachable(forward, "d") == ["e"]
+    assert reachable(forward, "fd") == ["d", "e"]
+    assert reachable(forward, "e") == ["e"]
+    assert reachable(backward, "d") == ["a", "b", "c", "f"]
+    assert reachable(backward, "f") == []
+    assert reachable(backward, "") == []
+
+
+def test_layers():
+    graph = Graph.from_edges(EDGES + [("f", "d")], nodes=["g"])
+
+    def layer_names(groups):
+        return ["".join(names(graph, group)) for group in groups]
+
+    from_bottom, from_top, cycles = layers(graph)
+    assert layer_names(from_bottom) == ["eg", "d", "abcf"]
+    assert layer_names(from_top) == ["abcfg", "d", "e"]
+    assert layer_names(cycles) == ["abc"]
+
+    from_bottom, from_top, cycles = layers(graph, [graph.ids["e"]])
+    assert layer_names(from_bottom) == ["deg", "abcf"]
+    assert layer_names(from_top) == ["abcefg", "d"]
+    assert layers(Graph([], [])) == ([], [], [])
+
+
+def test_elementary_cycles():
+    graph = Graph.from_edges(EDGES + [("a", "c"), ("e", "e")])
+    assert [names(graph, cycle) for cycle in elementary_cycles(graph)] == [
+        ["a", "b"],
+        ["a", "b", "c"],
+        ["a", "c"],
+        ["e"],
+    ]
+    assert [names(graph, cycle) for cycle in elementary_cycles(graph, 2)] == [
+        ["a", "b"],
+        ["a", "c"],
+        ["e"],
+    ]
+
+
+def test_feedback_arc_set():
+    graph = Graph.from_edges(EDGES + [("e", "e")])
+    cut = [(graph.names[s], graph.names[d]) for s, d in feedback_arc_set(graph)]
+    assert cut == [("a", "b"), ("e", "e")]
+    graph = Graph.from_edges(
+        [("a", "b"), ("b", "c"), ("c", "d"), ("d", "a"), ("d", "b"), ("d", "c")]
+    )
+    assert len(feedback_arc_set(graph, refine=True)) == 1
+
+
+def test_package_cycle_paths():
+    graph = Graph.from_edges(EDGES)
+    packages = ["p", "q", "p", "q", None]
+    excluded = [False] * len(graph)
+    paths = list(package_cycle_paths(graph, packages, excluded))
+    assert [names(graph, path) for path in paths] == [["a", "b", "c"], ["b", "c", "d"]]
+    paths = list(package_cycle_paths(graph, packages, excluded, ["p"]))
+    assert [names(graph, path) for path in paths] == [["b", "c", "d"]]
+    excluded[graph.ids["c"]] = True
+    assert list(package_cycle_paths(graph, packages, excluded)) == []
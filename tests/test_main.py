@@ -1,22 +1,28 @@
 from pathlib import Path
+from typing import Dict, List
 
 import json
 import shutil
+import subprocess
+import sys
 
 from click.testing import CliRunner
 
 from uncycle.main import cli
 
 TEST_DIR = Path(__file__).parent
+
+# generous, so it only catches an eager import of something heavy
+IMPORT_TIME_BUDGET_US = 250_000
 print(TEST_DIR)
 
 
-def do_test(command: str, expected_output: str):
+def do_test(command: str, expected_output: str, args: List[str] = []):
     runner = CliRunner()
     with runner.isolated_filesystem() as base:
         test_dir = Path(base) / "test_proj"
         shutil.copytree(TEST_DIR / "test_proj", test_dir)
-        r = runner.invoke(cli, ["--directory", str(test_dir), command])
+        r = runner.invoke(cli, ["--directory", str(test_dir), command, *args])
         print(r.output)
         assert r.exit_code == 0
         assert r.output == expected_output
@@ -45,6 +51,47 @@ def test_print_leafs():
     do_test("print_leafs", '[\n    "c.py"\n]\n')
 
 
+def test_print_layers():
+    output = {
+        "from_bottom": [["c.py", "d.py"], ["a.py", "b.py"]],
+        "from_top": [["a.py", "b.py", "d.py"], ["c.py"]],
+        "cycles": [["a.py", "b.py"]],
+    }
+    do_test("print_layers", json.dumps(output, indent=4) + "\n")
+    output = {
+        "from_bottom": [["a.py", "b.py", "c.py", "d.py"]],
+        "from_top": [["a.py", "b.py", "c.py", "d.py"]],
+        "cycles": [["a.py", "b.py"]],
+    }
+    do_test(
+        "print_layers", json.dumps(output, indent=4) + "\n", ["--ignore-dep", "c.py"]
+    )
+
+
+def test_export_graph():
+    do_test(
+        "export_graph",
+        "digraph uncycle {\n"
+        '  "a.py";\n'
+        '  "b.py";\n'
+        '  "a.py" -> "b.py";\n'
+        '  "b.py" -> "a.py";\n'
+        "}\n",
+        ["--only", "sccs"],
+    )
+    do_test(
+        "export_graph",
+        "kept 2 of 4 nodes and 1 of 3 edges\n"
+        '{\n  "nodes": [\n'
+        '    {"id": "a.py", "package": null},\n'
+        '    {"id": "b.py", "package": null}\n'
+        '  ],\n  "edges": [\n'
+        '    {"source": "a.py", "target": "b.py", "weight": 1}\n'
+        "  ]\n}\n",
+        ["-f", "json", "--max-nodes", "2", "--max-edges", "1"],
+    )
+
+
 def test_print_missing_annotations():
     do_test("print_missing_annotations", "a.py\nb.py\nc.py\nd.py\n")
 
@@ -57,3 +104,181 @@ def test_print_dependency_graph():
     graph = {"a.py": ["b.py"], "b.py": ["a.py", "c.py"]}
     expected_output = json.dumps(graph, indent=4) + "\n"
     do_test("print_dependency_graph", expected_output)
+
+
+def test_print_cycles_sccs():
+    do_test(
+        "print_cycles",
+        "strongly connected component of size 2: ['a.py', 'b.py']\n"
+        "cycle of length 2 found: ['a.py', 'b.py']\n"
+        "cycle count: 1\n",
+        ["-s", "-w", "0"],
+    )
+    do_test(
+        "print_cycles",
+        "cycle count: 0\n"
+        "search limit of 1 edge visits reached; 2 nodes on cycles not searched\n",
+        ["-w", "0", "--max-visits", "1"],
+    )
+
+
+def test_print_all_cycles():
+    do_test(
+        "print_cycles",
+        "cycle of length 2 found: ['a.py', 'b.py']\n"
+        "cycle count: 1\n"
+        "worst edges:\n"
+        "  1 ('a.py', 'b.py')\n"
+        "  1 ('b.py', 'a.py')\n",
+        ["--all-cycles", "--max-length", "3"],
+    )
+
+
+def test_print_cut_set():
+    do_test("print_cut_set", "('b.py', 'a.py')\ncut set size: 1\n")
+
+
+def test_extract_auto():
+    do_test(
+        "extract",
+        "layer 0: ['c.py', 'd.py']\n{'new_package': ['c.py', 'd.py']}\n",
+        ["new_package", "--auto"],
+    )
+    do_test(
+        "extract",
+        "layer 0: ['d.py']\n{'new_package': ['d.py']}\n",
+        ["new_package", "--auto", "--top"],
+    )
+    do_test(
+        "extract",
+        "layer 0: ['c.py']\n{'new_package': ['c.py']}\n",
+        ["new_package", "--auto", "--exclude", "d*"],
+    )
+    do_test(
+        "extract",
+        "layer 0: ['d.py']\n{'new_package': ['d.py']}\n",
+        ["new_package", "--auto", "--max-lines", "3"],
+    )
+
+
+def test_print_path():
+    do_test("print_path", "a.py -> b.py -> c.py\n", ["a.py", "c.py"])
+    do_test("print_path", "b.py -> a.py\n", ["b.py", "a.py", "--all-paths"])
+    do_test("print_path", "no path from c.py to a.py\n", ["c.py", "a.py"])
+
+
+def test_print_impacted():
+    do_test("print_impacted", '[\n    "a.py",\n    "b.py"\n]\n', ["c.py"])
+    do_test(
+        "print_impacted",
+        'ignoring unknown file: x.py\n[\n    "a.py",\n    "b.py"\n]\n',
+        ["a.py", "x.py"],
+    )
+    do_test("print_impacted", "[]\n", ["d.py"])
+
+
+def test_print_dependencies():
+    expected_output = json.dumps(["a.py", "b.py", "c.py"], indent=4) + "\n"
+    do_test("print_dependencies", expected_output, ["a.py"])
+    do_test("print_dependencies", "[]\n", ["c.py", "d.py"])
+
+
+def test_timings():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as base:
+        test_dir = Path(base) / "test_proj"
+        shutil.copytree(TEST_DIR / "test_proj", test_dir)
+        timings_path = Path(base) / "timings.json"
+        profile_path = Path(base) / "out.prof"
+        args = ["--timings-json", str(timings_path), "--profile", str(profile_path)]
+        r = runner.invoke(cli, ["--directory", str(test_dir), *args, "print_cycles"])
+        assert r.exit_code == 0
+        timings = json.loads(timings_path.read_text())
+        assert list(timings)[:4] == ["walk", "read", "parse", "remap_edges"]
+        assert timings["walk"]["counts"] == {"files": 4}
+        assert timings["parse"]["calls"] == 4
+        assert timings["cycles"]["counts"] == {"cycles": 1}
+        assert "total" in timings
+        assert profile_path.stat().st_size > 0
+
+
+def test_clear_cache_needs_cache():
+    runner = CliRunner()
+    args = ["--directory", str(TEST_DIR / "test_proj"), "--clear-cache", "print_leafs"]
+    r = runner.invoke(cli, args)
+    assert r.exit_code == 2
+    assert "--clear-cache needs --cache" in r.output
+
+
+def test_snapshot_diff():
+    runner = CliRunner()
+    with runner.isolated_filesystem() as base:
+        test_dir = Path(base) / "test_proj"
+        shutil.copytree(TEST_DIR / "test_proj", test_dir)
+        config_path = Path(base) / "config.yml"
+        config_path.write_text(
+            "package_contents:\n  p1: [a.py, b.py]\n  p2: [c.py]\n  p3: [d.py]\n"
+        )
+        snapshot_path = Path(base) / "graph.bin"
+        args = ["--directory", str(test_dir), "--config", str(config_path)]
+        r = runner.invoke(cli, [*args, "snapshot", "-o", str(snapshot_path)])
+        assert r.exit_code == 0
+
+        r = runner.invoke(cli, [*args, "diff", str(snapshot_path), "--check"])
+        assert r.exit_code == 0
+        assert r.output == (
+            "added edges: 0\nremoved edges: 0\nnew cycles: 0\n"
+            "added package edges: 0\nremoved package edges: 0\n"
+        )
+
+        (test_dir / "c.py").write_text("import a\nimport d\n")
+        r = runner.invoke(cli, [*args, "diff", str(snapshot_path), "--check"])
+        print(r.output)
+        assert r.exit_code == 1
+        assert r.output == (
+            "added edges: 2\n  + c.py -> a.py\n  + c.py -> d.py\n"
+            "removed edges: 0\n"
+            "new cycles: 1\n  a.py, b.py, c.py\n"
+            "added package edges: 2\n  + p2 -> p1\n  + p2 -> p3\n"
+            "removed package edges: 0\n"
+        )
+
+        snapshot_path.write_bytes(b"not a snapshot")
+        r = runner.invoke(cli, [*args, "diff", str(snapshot_path)])
+        assert r.exit_code == 1
+        assert "not an uncycle snapshot" in r.output
+
+
+def import_times(args: List[str]) -> Dict[str, int]:
+    """
+    Run python with `-X importtime` and return the cumulative import time in
+    microseconds of each module imported.
+    """
+    r = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        capture_output=True,
+        text=True,
+        cwd=TEST_DIR.parent,
+    )
+    assert r.returncode == 0, r.stderr
+    times = {}
+    for line in r.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_import_time():
+    times = import_times(["-c", "import uncycle.main"])
+    assert times["uncycle.main"] < IMPORT_TIME_BUDGET_US
+    for name in ["yaml", "multiprocessing", "uncycle.graph", "uncycle.commands"]:
+        assert name not in times
+
+    test_proj = str(TEST_DIR / "test_proj")
+    args = ["--directory", test_proj, "print_dependencies", "a.py"]
+    times = import_times(["-m", "uncycle.main", *args])
+    assert "uncycle.commands.paths" in times
+    for name in ["yaml", "multiprocessing", "uncycle.extract", "uncycle.serve"]:
+        assert name not in times
@@ -0,0 +1,85 @@
+from uncycle.graph import Graph, edge_representatives, remap_edges
+from uncycle.package_view import PackageView
+
+
+EDGES = [
+    ("a.py", "b.py"),
+    ("a.py", "c.py"),
+    ("b.py", "c.py"),
+    ("c.py", "a.py"),
+    ("c.py", "d.py"),
+    ("d.py", "b.py"),
+]
+
+
+def check_view(view, mapping, drop_missing, file_edges=EDGES):
+    graph = view.graph.quotient(mapping, drop_missing=drop_missing)
+    quotient = view.quotient()
+    assert quotient.names == graph.names
+    assert list(quotient.edges()) == list(graph.edges())
+    edges, _ = remap_edges(file_edges, mapping, drop_missing=drop_missing)
+    assert view.edges() == edges
+    wanted = set(edges)
+    assert view.representatives(wanted) == edge_representatives(
+        file_edges, mapping, wanted, drop_missing=drop_missing
+    )
+
+
+def test_package_view():
+    graph = Graph.from_edges(EDGES, ["e.py"])
+    mapping = {"a.py": "p", "b.py": "p", "d.py": "q"}
+    for drop_missing in (False, True):
+        view = PackageView(graph, mapping, drop_missing)
+        check_view(view, mapping, drop_missing)
+
+    view = PackageView(graph, mapping)
+    assert view.edge_counts == {
+        ("p", "c.py"): 2,
+        ("c.py", "p"): 1,
+        ("c.py", "q"): 1,
+        ("q", "p"): 1,
+    }
+    assert view.package("e.py") == "e.py"
+
+    # moving a file only touches its incident edges
+    view.assign("c.py", "q")
+    assert view.edge_counts == {("p", "q"): 2, ("q", "p"): 2}
+    check_view(view, dict(mapping, **{"c.py": "q"}), False)
+    view.assign("d.py", "p")
+    assert view.edge_counts == {("p", "q"): 2, ("q", "p"): 2}
+    assert view.representatives({("p", "q")}) == {
+        ("p", "q"): [("a.py", "c.py"), ("b.py", "c.py")]
+    }
+    view.assign("c.py", None)
+    assert view.edge_counts == {}
+    assert view.quotient().names == ["e.py", "p"]
+
+
+def test_patch():
+    mapping = {"a.py": "p", "b.py": "p", "d.py": "q"}
+    view = PackageView(Graph.from_edges(EDGES, ["e.py"]), mapping)
+    quotient = view.quotient()
+    assert view.memo("names", lambda: quotient.names) == ["c.py", "e.py", "p", "q"]
+
+    # an edge within a package leaves the package graph alone
+    edges = EDGES + [("b.py", "a.py")]
+    view.patch({}, {("b.py", "a.py"): 1}, lambda: Graph.from_edges(edges, ["e.py"]))
+    assert view.quotient() is quotient
+    assert view.memo("names", lambda: []) == ["c.py", "e.py", "p", "q"]
+    check_view(view, mapping, False, edges)
+
+    edges = [edge for edge in edges if edge != ("d.py", "b.py")]
+    edges += [("d.py", "f.py"), ("f.py", "e.py")]
+    view.patch(
+        {"f.py": 1},
+        {("d.py", "b.py"): -1, ("d.py", "f.py"): 1, ("f.py", "e.py"): 1},
+        lambda: Graph.from_edges(edges, ["e.py"]),
+    )
+    assert view.quotient() is not quotient
+    assert view.memo("names", lambda: []) == []
+    check_view(view, mapping, False, edges)
+
+    edges = [edge for edge in edges if "e.py" not in edge]
+    view.patch({"e.py": -1}, {("f.py", "e.py"): -1}, lambda: Graph.from_edges(edges))
+    assert view.edge_counts == PackageView(Graph.from_edges(edges), mapping).edge_counts
+    check_view(view, mapping, False, edges)
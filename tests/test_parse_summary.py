@@ -0,0 +1,202 @@
+from pathlib import Path
+
+import shutil
+
+from uncycle.cache import ParseCache
+from uncycle.config import Config
+from uncycle.edge import EdgeList
+from uncycle.file_metadata import FileMetadata
+from uncycle.parse_summary import (
+    build_parse_summary,
+    decode_source,
+    ParseState,
+    prefetch_contents,
+    summarize_bytes,
+    summarize_files_parallel,
+    summarize_source,
+)
+
+TEST_DIR = Path(__file__).parent
+
+
+def copy_test_proj(tmp_path: Path) -> Path:
+    test_dir = tmp_path / "test_proj"
+    shutil.copytree(TEST_DIR / "test_proj", test_dir)
+    return test_dir
+
+
+def test_parse_cache(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    cache_path = tmp_path / "cache.json"
+    expected = build_parse_summary(test_dir, [], top_level_only=False)
+
+    cache = ParseCache(cache_path, test_dir, top_level_only=False)
+    assert build_parse_summary(test_dir, [], False, cache=cache) == expected
+    assert (cache.hits, cache.misses) == (0, 4)
+
+    cache = ParseCache(cache_path, test_dir, top_level_only=False)
+    assert build_parse_summary(test_dir, [], False, cache=cache) == expected
+    assert (cache.hits, cache.misses) == (4, 0)
+
+    # a touched file with unchanged contents is still a hit
+    (test_dir / "a.py").write_text((test_dir / "a.py").read_text() + "\n")
+    (test_dir / "d.py").write_text((test_dir / "d.py").read_text())
+    (test_dir / "c.py").unlink()
+    expected = build_parse_summary(test_dir, [], top_level_only=False)
+    cache = ParseCache(cache_path, test_dir, top_level_only=False)
+    assert build_parse_summary(test_dir, [], False, cache=cache) == expected
+    assert (cache.hits, cache.misses, cache.removed) == (2, 1, 1)
+
+    cache = ParseCache(cache_path, test_dir, top_level_only=False, clear=True)
+    assert build_parse_summary(test_dir, [], False, cache=cache) == expected
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    cache = ParseCache(cache_path, test_dir, top_level_only=True)
+    build_parse_summary(test_dir, [], True, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    # a cache written for another directory is discarded, even with the same files
+    other_dir = tmp_path / "other"
+    shutil.copytree(test_dir, other_dir)
+    cache = ParseCache(cache_path, other_dir, top_level_only=True)
+    build_parse_summary(other_dir, [], True, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 3)
+
+
+def test_parallel_parse(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    for idx in range(20):
+        (test_dir / f"m{idx}.py").write_text(f"import m{(idx + 1) % 20}\nimport a\n")
+    expected = build_parse_summary(test_dir, [], top_level_only=False)
+    for jobs, prefetch in [(2, 0), (0, 0), (2, 3)]:
+        summary = build_parse_summary(test_dir, [], False, jobs=jobs, prefetch=prefetch)
+        assert summary == expected
+        assert list(summary.node_to_metadata) == list(expected.node_to_metadata)
+
+
+def test_parse_state(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    state = ParseState(test_dir, [], top_level_only=False)
+    assert state.summary() == build_parse_summary(test_dir, [], False)
+    nodes = set(state.nodes)
+    edges = set(state.edges)
+
+    def apply(node_changes, edge_changes):
+        for changes, items in [(node_changes, nodes), (edge_changes, edges)]:
+            for item, delta in changes.items():
+                if delta > 0:
+                    items.add(item)
+                else:
+                    items.remove(item)
+
+    state.listeners.append(apply)
+    assert state.refresh() == []
+
+    (test_dir / "a.py").write_text("import e\nimport d\n")
+    (test_dir / "c.py").unlink()
+    (test_dir / "e.py").write_text("import a\n# Package: pe\n")
+    (test_dir / "d").mkdir()
+    (test_dir / "d" / "__init__.py").write_text("import b\n")
+    assert state.refresh() == ["a.py", "c.py", "d/__init__.py", "e.py"]
+    assert state.summary() == build_parse_summary(test_dir, [], False)
+    assert (nodes, edges) == (set(state.nodes), set(state.edges))
+
+    (test_dir / "d" / "__init__.py").unlink()
+    assert state.refresh() == ["d/__init__.py"]
+    assert state.summary() == build_parse_summary(test_dir, [], False)
+    assert (nodes, edges) == (set(state.nodes), set(state.edges))
+
+
+def test_config_package_view(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    package_contents = {"p": ["a.py", "b.py"], "q": ["c.py", "d.py"]}
+    config = Config(test_dir, [], package_contents, top_level_only=False)
+    mapping = config.package_map()
+    config.parse_state = ParseState(test_dir, [], top_level_only=False)
+    view = config.package_view(mapping)
+    assert view.edges() == [("p", "q")]
+
+    (test_dir / "d.py").write_text("import a\n")
+    config.parse_state.refresh()
+    assert config.package_view(mapping) is view
+    assert view.edges() == [("p", "q"), ("q", "p")]
+
+    # a new file edge behind an existing package edge keeps the quotient
+    quotient = view.quotient()
+    (test_dir / "c.py").write_text("from . import d\nimport b\n")
+    config.parse_state.refresh()
+    assert view.quotient() is quotient
+    assert view.representatives({("q", "p")}) == {
+        ("q", "p"): [("c.py", "b.py"), ("d.py", "a.py")]
+    }
+
+
+def test_summarize_bytes():
+    base_dir = Path("/proj")
+    path = base_dir / "pkg" / "mod.py"
+    sources = [
+        b"",
+        b"x = 1\n",
+        b"import os\nfrom . import a\n# Package: core \n",
+        b"def f():\n    import b\n\n\n",
+        b"# Package: a\n# Package: b",
+        b"import os\r\n# Package: win\r\n",
+        b"import os\r# Package: mac\r",
+        b"s = '\xc3\xa9'\n# Package: \xc3\xa9\n",
+        b"# Package: x\x1c\n",
+    ]
+    for data in sources:
+        for top_level_only in (False, True):
+            expected = summarize_source(
+                decode_source(data), base_dir, path, top_level_only
+            )
+            assert summarize_bytes(data, base_dir, path, top_level_only) == expected
+
+    # import-free files aren't parsed at all
+    expected = ([], FileMetadata(2, "core"))
+    assert summarize_bytes(b"# Package: core\n(", base_dir, path, False) == expected
+
+
+def test_prefetch_parse(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    expected = build_parse_summary(test_dir, [], top_level_only=False)
+    for prefetch in (1, 2, 16):
+        assert build_parse_summary(test_dir, [], False, prefetch=prefetch) == expected
+
+    # cache hits are yielded in walk order between the prefetched misses
+    cache_path = tmp_path / "cache.json"
+    for hits, misses in [(0, 4), (4, 0), (3, 1)]:
+        if misses == 1:
+            (test_dir / "b.py").write_text("import d\n")
+            expected = build_parse_summary(test_dir, [], top_level_only=False)
+        cache = ParseCache(cache_path, test_dir, top_level_only=False)
+        summary = build_parse_summary(test_dir, [], False, cache=cache, prefetch=2)
+        assert summary == expected
+        assert list(summary.node_to_metadata) == list(expected.node_to_metadata)
+        assert (cache.hits, cache.misses) == (hits, misses)
+
+    paths = sorted(test_dir.glob("*.py"))
+    contents = list(prefetch_contents(iter(paths), 2))
+    assert contents == [(path, path.read_bytes()) for path in paths]
+
+    # the digest is only computed for the cache
+    for prefetch in (0, 4):
+        results = summarize_files_parallel(paths, test_dir, False, 1, prefetch)
+        assert all(digest is not None for _, _, digest in results)
+        results = summarize_files_parallel(
+            paths, test_dir, False, 1, prefetch, want_digest=False
+        )
+        assert all(digest is None for _, _, digest in results)
+
+
+def test_edge_list(tmp_path: Path):
+    test_dir = copy_test_proj(tmp_path)
+    summary = build_parse_summary(test_dir, [], top_level_only=False)
+    edges = [("a.py", "b.py"), ("b.py", "a.py"), ("b.py", "c.py")]
+    assert isinstance(summary.edges, EdgeList)
+    assert summary.edges == edges and edges == summary.edges
+    assert list(summary.edges) == edges
+    assert summary.edges[-1] == ("b.py", "c.py")
+    assert summary.edges[1:] == edges[1:]
+    assert summary.edges != edges[:2]
+    assert EdgeList.from_edges(edges, summary.nodes) == summary.edges
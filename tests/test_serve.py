@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import io
+import json
+import shutil
+
+from uncycle.config import Config
+from uncycle.serve import QueryServer, serve_stream
+
+TEST_DIR = Path(__file__).parent
+
+
+def test_query_server(tmp_path: Path):
+    test_dir = tmp_path / "test_proj"
+    shutil.copytree(TEST_DIR / "test_proj", test_dir)
+    config = Config(
+        dir_path=test_dir,
+        ignore_cycles_in=[],
+        package_contents={},
+        top_level_only=False,
+    )
+    server = QueryServer(config)
+
+    def query(**request) -> dict:
+        return json.loads(server.handle_line(json.dumps(request)))
+
+    assert query(op="used_by", node="a.py") == {"ok": True, "result": ["b.py"]}
+    assert query(op="imports", node="b.py", id=7) == {
+        "ok": True,
+        "result": ["a.py", "c.py"],
+        "id": 7,
+    }
+    assert query(op="leafs")["result"] == ["c.py"]
+    assert query(op="package_graph")["result"] == {}
+    assert query(op="cycles")["result"] == [["a.py", "b.py"]]
+    assert query(op="path", src="a.py", dst="c.py")["result"] == [
+        "a.py",
+        "b.py",
+        "c.py",
+    ]
+    assert query(op="path", src="c.py", dst="a.py")["result"] == []
+    assert query(op="imports", node="x.py") == {
+        "ok": False,
+        "error": "unknown node: 'x.py'",
+    }
+    assert query(op="nope")["ok"] is False
+    assert json.loads(server.handle_line("[1]"))["ok"] is False
+
+    (test_dir / "c.py").write_text("import a\n")
+    assert query(op="reload")["result"] == ["c.py"]
+    assert query(op="used_by", node="a.py")["result"] == ["b.py", "c.py"]
+    assert query(op="cycles")["result"] == [["a.py", "b.py"], ["a.py", "b.py", "c.py"]]
+    assert query(op="reload")["result"] == []
+
+    out = io.StringIO()
+    serve_stream(server, io.StringIO('{"op": "leafs"}\n\n{"op": "leafs"}\n'), out)
+    assert out.getvalue() == '{"ok": true, "result": []}\n' * 2
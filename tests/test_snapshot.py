@@ -0,0 +1,57 @@
+from uncycle.file_metadata import FileMetadata
+from uncycle.parse_summary import ParseSummary
+from uncycle.snapshot import (
+    HEADER,
+    SNAPSHOT_VERSION,
+    diff_summaries,
+    dump_snapshot,
+    load_snapshot,
+)
+
+import pytest
+
+
+def test_snapshot_round_trip():
+    summary = ParseSummary(
+        nodes=["a.py", "b.py", "pkg/c.py", "é.py"],
+        edges=[("a.py", "b.py"), ("b.py", "pkg/c.py"), ("pkg/c.py", "a.py")],
+        node_to_metadata={
+            "a.py": FileMetadata(10, None),
+            "b.py": FileMetadata(0, "inline"),
+            "pkg/c.py": FileMetadata(3, None),
+            "é.py": FileMetadata(1, "a.py"),
+        },
+    )
+    data = dump_snapshot(summary)
+    assert load_snapshot(data) == summary
+    empty = ParseSummary(nodes=[], edges=[], node_to_metadata={})
+    assert load_snapshot(dump_snapshot(empty)) == empty
+
+    with pytest.raises(ValueError, match="not an uncycle snapshot"):
+        load_snapshot(b"UNCYCLE")
+    with pytest.raises(ValueError, match="truncated"):
+        load_snapshot(data[:-1])
+    with pytest.raises(ValueError, match="unsupported snapshot version"):
+        version = (SNAPSHOT_VERSION + 1).to_bytes(4, "little")
+        load_snapshot(data[:8] + version + data[12:])
+    assert HEADER.size == 32
+
+
+def test_diff_summaries():
+    old = ParseSummary(
+        nodes=["a.py", "b.py", "c.py"],
+        edges=[("a.py", "b.py"), ("b.py", "c.py")],
+        node_to_metadata={},
+    )
+    new = ParseSummary(
+        nodes=["a.py", "b.py", "c.py"],
+        edges=[("a.py", "b.py"), ("b.py", "a.py"), ("c.py", "c.py")],
+        node_to_metadata={},
+    )
+    packages = {"a.py": "p", "b.py": "p", "c.py": "q"}
+    result = diff_summaries(old, new, packages, packages)
+    assert result.added_edges == [("b.py", "a.py"), ("c.py", "c.py")]
+    assert result.removed_edges == [("b.py", "c.py")]
+    assert result.new_sccs == [["c.py"], ["a.py", "b.py"]]
+    assert result.added_package_edges == []
+    assert result.removed_package_edges == [("p", "q")]
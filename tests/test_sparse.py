@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import random
+
+from click.testing import CliRunner
+import pytest
+
+from uncycle.backend import set_backend
+from uncycle.edge import EdgeList
+from uncycle.graph import (
+    Graph,
+    ReachabilityIndex,
+    leaf_nodes,
+    reachable,
+    strongly_connected_components,
+)
+from uncycle.main import cli
+
+TEST_DIR = Path(__file__).parent
+
+EDGES = sorted(
+    [("a", "b"), ("b", "a"), ("b", "c"), ("c", "a"), ("c", "d"), ("d", "e"), ("f", "d")]
+)
+
+
+@pytest.fixture(params=["python", "scipy"])
+def backend(request):
+    if request.param == "scipy":
+        pytest.importorskip("scipy")
+    set_backend(request.param)
+    yield request.param
+    set_backend("auto")
+
+
+def names(graph, nodes):
+    return [graph.names[node] for node in nodes]
+
+
+def test_graph_analytics(backend):
+    graph = Graph.from_edges(EdgeList.from_edges(EDGES, list("abcdefg")), ["g"])
+    assert graph.names == list("abcdefg")
+    assert list(graph.edges()) == EDGES
+    sccs = strongly_connected_components(graph, canonical=True)
+    # by height in the condensation, then smallest node
+    assert [names(graph, scc) for scc in sccs] == [
+        ["e"],
+        ["g"],
+        ["d"],
+        ["a", "b", "c"],
+        ["f"],
+    ]
+    assert names(graph, leaf_nodes(graph)) == ["e"]
+    assert names(graph, leaf_nodes(graph, [graph.ids["e"]])) == ["d", "e"]
+
+    def reachable_names(nodes, reverse=False):
+        nodes = [graph.ids[node] for node in nodes]
+        return names(graph, reachable(graph, nodes, reverse))
+
+    assert reachable_names("a") == ["a", "b", "c", "d", "e"]
+    assert reachable_names("fd") == ["d", "e"]
+    assert reachable_names("d", reverse=True) == ["a", "b", "c", "f"]
+    assert reachable_names("") == []
+
+
+def test_backends_agree():
+    pytest.importorskip("scipy")
+    rng = random.Random(0)
+    try:
+        for _ in range(200):
+            n = rng.randint(1, 30)
+            node_names = [f"n{idx:02}" for idx in range(n)]
+            pairs = [
+                (rng.choice(node_names), rng.choice(node_names))
+                for _ in range(rng.randint(0, 3 * n))
+            ]
+            edges = EdgeList.from_edges(pairs, node_names)
+            nodes = rng.sample(node_names, rng.randint(0, n))
+            node_count = len(set(nodes).union(*pairs))
+            query = rng.sample(range(node_count), rng.randint(0, node_count))
+            results = []
+            for backend in ("python", "scipy"):
+                set_backend(backend)
+                graph = Graph.from_edges(edges, nodes)
+                results.append(
+                    (
+                        graph.names,
+                        list(graph.edges()),
+                        list(graph.reversed().edges()),
+                        strongly_connected_components(graph, canonical=True),
+                        leaf_nodes(graph, query),
+                        reachable(graph, query),
+                        reachable(graph, query, reverse=True),
+                    )
+                )
+            assert results[0] == results[1]
+            assert results[0][5] == ReachabilityIndex(graph).reachable(query)
+    finally:
+        set_backend("auto")
+
+
+def test_backend_option(backend):
+    runner = CliRunner()
+    directory = str(TEST_DIR / "test_proj")
+    for command, expected_output in [
+        (["print_leafs"], '[\n    "c.py"\n]\n'),
+        (["print_impacted", "c.py"], '[\n    "a.py",\n    "b.py"\n]\n'),
+        (["print_cycles"], "cycle of length 2 found: ['a.py', 'b.py']\n"),
+    ]:
+        args = ["--directory", directory, "--backend", backend, *command]
+        r = runner.invoke(cli, args)
+        assert r.exit_code == 0
+        assert r.output.startswith(expected_output)
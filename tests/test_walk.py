@@ -0,0 +1,42 @@
+from pathlib import Path
+
+from uncycle.walk import ExclusionMatcher, walk_python_files
+
+
+def test_exclusion_matcher():
+    matcher = ExclusionMatcher(
+        [Path("a/b.py"), Path("c"), "**/migrations", "tests/*.py"], Path("/r")
+    )
+    assert matcher.matches("a/b.py")
+    assert not matcher.matches("a/c.py")
+    assert matcher.matches("c/d/e.py")
+    assert matcher.matches("/r/c")
+    assert not matcher.matches("/s/c")
+    assert matcher.matches("migrations/0001.py")
+    assert matcher.matches("x/y/migrations/0001.py")
+    assert matcher.matches("tests/test_a.py")
+    assert not matcher.matches("tests/data/a.py")
+    assert not ExclusionMatcher([], Path("/r")).matches("a.py")
+
+
+def test_walk_python_files(tmp_path: Path):
+    for name in ["a.py", "b.txt", "e.py", "d/c.py", "d/f/g.py", "h/i.py", "j/.py"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("import os\n")
+    (tmp_path / "empty.py").write_text("")
+
+    expected = sorted(["a.py", "e.py", "d/c.py", "d/f/g.py", "h/i.py"])
+    for threads in (1, 4):
+        matcher = ExclusionMatcher([], tmp_path)
+        found = [
+            str(path.relative_to(tmp_path))
+            for path, st in walk_python_files(tmp_path, matcher, threads)
+        ]
+        assert sorted(found) == expected
+
+    matcher = ExclusionMatcher(["d/f", "h/*.py"], tmp_path)
+    found = [
+        str(p.relative_to(tmp_path)) for p, st in walk_python_files(tmp_path, matcher)
+    ]
+    assert sorted(found) == ["a.py", "d/c.py", "e.py"]
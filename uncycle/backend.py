@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from types import ModuleType
+from typing import Optional
+
+
+# "python" for the pure-Python graph analytics, "scipy" for the vectorised ones in
+# `uncycle.sparse`, or "auto" for "scipy" on graphs of at least `SPARSE_MIN_EDGES`
+# edges if numpy and scipy are installed
+BACKENDS = ("auto", "python", "scipy")
+
+# importing scipy takes about half a second, which only pays off on large graphs
+SPARSE_MIN_EDGES = 200_000
+
+_backend = "auto"
+_sparse: Optional[ModuleType] = None
+_sparse_missing = False
+
+
+def set_backend(backend: str) -> None:
+    """
+    Select the graph backend. Raises `ImportError` if it's "scipy" and numpy or
+    scipy is missing.
+    """
+    global _backend
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend!r}")
+    if backend == "scipy":
+        from . import sparse  # noqa: F401
+    _backend = backend
+
+
+def get_backend() -> str:
+    return _backend
+
+
+def sparse_backend(edge_count: int) -> Optional[ModuleType]:
+    """
+    Return the `uncycle.sparse` module if a graph of `edge_count` edges should be
+    handled by it, or `None` for the pure-Python code.
+    """
+    global _sparse, _sparse_missing
+    if _backend == "python":
+        return None
+    if _backend == "auto" and (edge_count < SPARSE_MIN_EDGES or _sparse_missing):
+        return None
+    if _sparse is None:
+        try:
+            from . import sparse
+        except ImportError:
+            if _backend == "scipy":
+                raise
+            _sparse_missing = True
+            return None
+        _sparse = sparse
+    return _sparse
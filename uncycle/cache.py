@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import hashlib
+import json
+import os
+import sys
+
+from .file_metadata import FileMetadata
+
+
+CACHE_VERSION = 2
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class ParseCache:
+    """
+    A persistent on-disk cache of per-file parse results.
+
+    Entries are keyed by the file path relative to the parsed directory `base_dir`
+    and are considered valid when the file's mtime and size match. If either changed, the
+    contents are hashed, and the entry is still reused if the hash matches.
+    Each entry stores the resolved import list, the line count and the inline
+    `# Package:` annotation of the file. Imports are resolved against `base_dir`, so
+    a cache written for another directory is discarded as if cleared.
+    """
+
+    def __init__(
+        self, path: Path, base_dir: Path, top_level_only: bool, clear: bool = False
+    ):
+        self.path = path
+        self.base_dir = str(base_dir.resolve())
+        self.top_level_only = top_level_only
+        self.entries: Dict[str, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.removed = 0
+        self.dirty = clear
+        if not clear:
+            self.entries = self._load()
+
+    def _load(self) -> Dict[str, list]:
+        try:
+            blob = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.dirty = True
+            return {}
+        if (
+            not isinstance(blob, dict)
+            or blob.get("version") != CACHE_VERSION
+            or blob.get("base_dir") != self.base_dir
+            or blob.get("top_level_only") != self.top_level_only
+        ):
+            self.dirty = True
+            return {}
+        return blob.get("files", {})
+
+    def get(
+        self, key: str, path: Path, st: Optional[os.stat_result] = None
+    ) -> Optional[Tuple[List[str], FileMetadata]]:
+        """
+        Return the cached `(imports, metadata)` for `path`, or `None` on a miss.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        mtime_ns, size, digest, imports, line_count, inline_package = entry
+        if st is None:
+            st = path.stat()
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            if content_digest(path.read_bytes()) != digest:
+                self.misses += 1
+                return None
+            entry[0] = st.st_mtime_ns
+            entry[1] = st.st_size
+            self.dirty = True
+        self.hits += 1
+        if inline_package is not None:
+            inline_package = sys.intern(inline_package)
+        return imports, FileMetadata(line_count, inline_package)
+
+    def put(
+        self,
+        key: str,
+        st: os.stat_result,
+        digest: str,
+        imports: List[str],
+        metadata: FileMetadata,
+    ) -> None:
+        self.entries[key] = [
+            st.st_mtime_ns,
+            st.st_size,
+            digest,
+            imports,
+            metadata.line_count,
+            metadata.inline_package,
+        ]
+        self.dirty = True
+
+    def prune(self, keep: Set[str]) -> None:
+        """
+        Drop entries for files that no longer exist in the tree.
+        """
+        stale = [k for k in self.entries if k not in keep]
+        for k in stale:
+            del self.entries[k]
+        if stale:
+            self.removed += len(stale)
+            self.dirty = True
+
+    def save(self) -> None:
+        if not self.dirty:
+            return
+        blob = {
+            "version": CACHE_VERSION,
+            "base_dir": self.base_dir,
+            "top_level_only": self.top_level_only,
+            "files": self.entries,
+        }
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps(blob, separators=(",", ":")))
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def summary(self) -> str:
+        return (
+            f"parse cache: {self.hits} hit(s), {self.misses} miss(es), "
+            f"{self.removed} removed"
+        )
@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from ..graph import (
+    Graph,
+    elementary_cycles,
+    feedback_arc_set,
+    is_cyclic_component,
+    package_cycle_paths,
+    shortest_cycles,
+    strongly_connected_components,
+)
+from ..hooks import phase
+from ..walk import ExclusionMatcher
+from .graphs import generate_forward_lookup_from_reverse
+
+
+def edges_for_cycle(cycle: List[str]) -> List[Tuple[str, str]]:
+    edges: List[Tuple[str, str]] = []
+    for idx in range(len(cycle) - 1):
+        src = cycle[idx]
+        dst = cycle[idx + 1]
+        edges.append((src, dst))
+    edges.append((cycle[-1], cycle[0]))
+    return edges
+
+
+def canonicalize_cycle(cycle: List[str]) -> List[str]:
+    idx = min(range(len(cycle)), key=lambda x: cycle[x])
+    return cycle[idx:] + cycle[:idx]
+
+
+@click.command("print_cycles")
+@click.option(
+    "-w",
+    "--worst-edge-count",
+    type=int,
+    default=5,
+    help="Number of `worst edges` to print",
+)
+@click.option(
+    "-p",
+    "--print-reps",
+    is_flag=True,
+    help="Print file-level edges represented by package-level edges",
+)
+@click.option(
+    "-s",
+    "--print-sccs",
+    is_flag=True,
+    help="Print each strongly connected component that contains a cycle",
+)
+@click.option(
+    "-a",
+    "--all-cycles",
+    is_flag=True,
+    help="Enumerate all elementary cycles instead of one shortest cycle per node",
+)
+@click.option(
+    "--max-cycles",
+    type=int,
+    default=10000,
+    help="Maximum number of cycles to enumerate with `--all-cycles`",
+)
+@click.option(
+    "--max-length",
+    type=int,
+    default=None,
+    help="Maximum length of cycles to enumerate with `--all-cycles`",
+)
+@click.option(
+    "--max-visits",
+    type=int,
+    default=5_000_000,
+    help="Maximum edges visited by the shortest cycle searches, after which the "
+    "remaining nodes are not searched (0 for no limit)",
+)
+@click.pass_context
+def print_cycles(
+    ctx: click.Context,
+    worst_edge_count: int,
+    print_reps: bool,
+    print_sccs: bool,
+    all_cycles: bool,
+    max_cycles: int,
+    max_length: Optional[int],
+    max_visits: int,
+) -> None:
+    config = ctx.obj
+    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
+    view = config.package_view(rev_mod_map)
+    graph = view.quotient()
+    names = graph.names
+    cycle_paths: set[tuple[str, ...]] = set()
+    with phase("cycles") as counts:
+        sccs = view.memo(
+            "cyclic_sccs",
+            lambda: [
+                scc
+                for scc in strongly_connected_components(graph)
+                if is_cyclic_component(graph, scc)
+            ],
+        )
+        cyclic_sccs = [[names[node] for node in scc] for scc in sccs]
+        unsearched = 0
+        if not all_cycles:
+            # acyclic nodes are never searched
+            cycles, unsearched = view.memo(
+                ("shortest_cycles", max_visits),
+                lambda: shortest_cycles(graph, sccs, max_visits or None),
+            )
+            for cycle in cycles:
+                cycle_paths.add(tuple(names[node] for node in cycle))
+        limit_reached = False
+        if all_cycles:
+            for cycle in elementary_cycles(graph, max_length):
+                if len(cycle_paths) >= max_cycles:
+                    limit_reached = True
+                    break
+                cycle_paths.add(tuple(names[node] for node in cycle))
+        counts["cycles"] = len(cycle_paths)
+    counter: Counter[tuple[str, str]] = Counter()
+    for cycle_tuple in cycle_paths:
+        cycle = list(cycle_tuple)
+        counter.update(edges_for_cycle(cycle))
+
+    with phase("output"):
+        if print_sccs:
+            for scc in sorted(cyclic_sccs, key=lambda x: (len(x), x)):
+                print(f"strongly connected component of size {len(scc)}: {scc}")
+        cycle_paths_list = sorted(cycle_paths, key=lambda x: (len(x), x))
+        for cycle_path in cycle_paths_list:
+            print(f"cycle of length {len(cycle_path)} found: {list(cycle_path)}")
+        print(f"cycle count: {len(cycle_paths)}")
+        if limit_reached:
+            print(f"cycle limit of {max_cycles} reached; enumeration stopped")
+        if unsearched:
+            print(
+                f"search limit of {max_visits} edge visits reached;"
+                f" {unsearched} nodes on cycles not searched"
+            )
+        if worst_edge_count > 0:
+            print("worst edges:")
+            for edge, count in sorted(
+                counter.most_common(worst_edge_count), key=lambda x: (-x[1], x[0])
+            ):
+                print(f"{count:3d} {edge}")
+        if print_reps:
+            reps = view.representatives(set(counter))
+            print("edge representatives:")
+            for edge, rep in sorted(reps.items()):
+                if len(rep) == 1 and rep[0] == edge:
+                    continue
+                print(f" {edge}:")
+                for r in rep:
+                    print(f"   {r}")
+
+
+@click.command("print_cut_set")
+@click.option(
+    "-r",
+    "--refine",
+    is_flag=True,
+    help="Refine the edge ordering with a local search",
+)
+@click.pass_context
+def print_cut_set(ctx: click.Context, refine: bool) -> None:
+    config = ctx.obj
+    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
+    view = config.package_view(rev_mod_map)
+    graph = view.quotient()
+    names = graph.names
+    arcs = view.memo(
+        ("feedback_arc_set", refine), lambda: feedback_arc_set(graph, refine=refine)
+    )
+    cut_set = [(names[src], names[dst]) for src, dst in arcs]
+    reps = view.representatives(set(cut_set))
+    for edge in cut_set:
+        print(edge)
+        rep = reps.get(edge, [])
+        if len(rep) == 1 and rep[0] == edge:
+            continue
+        for r in rep:
+            print(f"   {r}")
+    print(f"cut set size: {len(cut_set)}")
+
+
+@click.command("print_cycles_legacy")
+@click.option(
+    "--ignore-cycles-in",
+    "ignore_cycles_in",
+    multiple=True,
+    type=str,
+    help="Ignore dependency cycles in a package",
+)
+@click.pass_context
+def print_cycles_legacy(ctx: click.Context, ignore_cycles_in: List[str]) -> None:
+    config = ctx.obj
+    excluded_paths = config.excluded_paths
+    ignore_cycles_in = config.ignore_cycles_in
+    parse_summary = config.build_parse_summary()
+    graph = Graph.from_edges(parse_summary.edges)
+
+    path_to_package: Dict[Path, str] = config.package_map_path(
+        parse_summary.node_to_metadata
+    )
+    packages: List[Optional[str]] = [
+        path_to_package.get(Path(name)) for name in graph.names
+    ]
+
+    excluded_matcher = ExclusionMatcher(excluded_paths, config.dir_path)
+    excluded = [excluded_matcher.matches(name) for name in graph.names]
+
+    with phase("cycles") as counts:
+        stacks = list(package_cycle_paths(graph, packages, excluded, ignore_cycles_in))
+        counts["cycles"] = len(stacks)
+
+    # Format and return the accumulated paths as strings showing the cycles.
+    with phase("output"):
+        r = [
+            " -> ".join([graph.names[d] + f" ({packages[d]})" for d in stack])
+            for stack in stacks
+        ]
+        print("\n".join(r))
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import TextIO
+
+import click
+
+from ..export import WRITERS, build_export_graph
+from ..graph import Graph
+from ..hooks import phase
+
+
+@click.command("export_graph")
+@click.option(
+    "-f",
+    "--format",
+    "output_format",
+    type=click.Choice(sorted(WRITERS)),
+    default="dot",
+    help="Output format",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.File("w"),
+    default="-",
+    help="File to write, by default stdout",
+)
+@click.option(
+    "-p",
+    "--packages",
+    is_flag=True,
+    help="Export the package graph, edges weighted by the imports behind them",
+)
+@click.option(
+    "--only",
+    type=click.Choice(["all", "sccs", "cycles"]),
+    default="all",
+    help="Keep only the cyclic strongly connected components, or shortest cycles",
+)
+@click.option(
+    "--max-nodes",
+    type=int,
+    default=0,
+    help="Keep at most this many nodes, those with the most edges (0 for no cap)",
+)
+@click.option(
+    "--max-edges",
+    type=int,
+    default=0,
+    help="Keep at most this many edges, the heaviest (0 for no cap)",
+)
+@click.pass_context
+def export_graph(
+    ctx: click.Context,
+    output_format: str,
+    output: TextIO,
+    packages: bool,
+    only: str,
+    max_nodes: int,
+    max_edges: int,
+) -> None:
+    """
+    Write the file graph, clustered by package, or the package graph as DOT,
+    GraphML or JSON. Packages come from the configuration and inline annotations.
+    """
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    graph = Graph.from_edges(parse_summary.edges, parse_summary.nodes)
+    path_to_package = config.package_map(parse_summary.node_to_metadata)
+    export, node_count, edge_count = build_export_graph(
+        graph, path_to_package, packages, only, max_nodes, max_edges
+    )
+    if len(export.names) < node_count or export.edge_count < edge_count:
+        click.echo(
+            f"kept {len(export.names)} of {node_count} nodes"
+            f" and {export.edge_count} of {edge_count} edges",
+            err=True,
+        )
+    with phase("export", nodes=len(export.names), edges=export.edge_count):
+        WRITERS[output_format](export, output)
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+import click
+
+from ..extract import extract
+
+
+@click.command("extract")
+@click.argument("new_package_name", type=str)
+@click.option(
+    "--top", type=bool, is_flag=True, help="Peel nodes from tree top instead of bottom"
+)
+@click.option(
+    "--auto",
+    is_flag=True,
+    help="Non-interactively peel every potential node, layer by layer",
+)
+@click.option(
+    "--max-lines",
+    type=int,
+    default=None,
+    help="With `--auto`, never peel files with more lines than this",
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    type=str,
+    help="With `--auto`, never peel files matching this glob pattern",
+)
+@click.pass_context
+def do_extract(
+    ctx: click.Context,
+    new_package_name: str,
+    top: bool,
+    auto: bool,
+    max_lines: Optional[int],
+    exclude: List[str],
+) -> None:
+    config = ctx.obj
+    extract(config, new_package_name, top, auto, max_lines, list(exclude))
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+import json
+
+import click
+
+from ..graph import Graph, layers, leaf_nodes
+
+
+def generate_forward_lookup_from_reverse(
+    rlookup: Dict[str, List[str]],
+) -> Dict[str, str]:
+    d = {}
+    for k, vs in rlookup.items():
+        for v in vs:
+            if v in d:
+                raise ValueError(f"key {v} already in dictionary")
+            d[v] = k
+    return d
+
+
+@click.command("print_leafs")
+@click.option("--ignore-dep", multiple=True, type=str, help="Ignore a dependency")
+@click.pass_context
+def print_leafs(ctx: click.Context, ignore_dep: List[str]) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
+    graph = Graph.from_edges(parse_summary.edges).quotient(
+        rev_mod_map, drop_missing=False
+    )
+
+    deps_to_ignore = [graph.ids[dep] for dep in ignore_dep if dep in graph.ids]
+    leafs = [graph.names[node] for node in leaf_nodes(graph, deps_to_ignore)]
+    print(json.dumps(leafs, indent=4))
+
+
+@click.command("print_layers")
+@click.option("--ignore-dep", multiple=True, type=str, help="Ignore a dependency")
+@click.pass_context
+def print_layers(ctx: click.Context, ignore_dep: List[str]) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
+    graph = Graph.from_edges(parse_summary.edges, parse_summary.nodes).quotient(
+        rev_mod_map, drop_missing=False
+    )
+
+    deps_to_ignore = [graph.ids[dep] for dep in ignore_dep if dep in graph.ids]
+    from_bottom, from_top, cycles = layers(graph, deps_to_ignore)
+
+    def names(groups: List[List[int]]) -> List[List[str]]:
+        return [[graph.names[node] for node in group] for group in groups]
+
+    output = {
+        "from_bottom": names(from_bottom),
+        "from_top": names(from_top),
+        "cycles": names(cycles),
+    }
+    print(json.dumps(output, indent=4))
+
+
+@click.command("print_edges")
+@click.pass_context
+def print_edges(ctx: click.Context) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    for edge in parse_summary.edges:
+        print(edge)
+
+
+@click.command("print_missing_annotations")
+@click.pass_context
+def print_missing_annotations(ctx: click.Context) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    missing_annotations = []
+    for path in parse_summary.nodes:
+        md = parse_summary.node_to_metadata.get(path)
+        if md is None or md.inline_package is None:
+            missing_annotations.append(path)
+    print("\n".join(missing_annotations))
+
+
+@click.command("print_dependency_graph")
+@click.pass_context
+def print_dependency_graph(ctx: click.Context) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    dep_graph = Graph.from_edges(parse_summary.edges).adjacency_list()
+    print(json.dumps(dep_graph, indent=4))
+
+
+@click.command("print_virtual_dependency_graph")
+@click.pass_context
+def print_virtual_dependency_graph(ctx: click.Context) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    path_to_package = parse_summary.path_to_package()
+    graph = Graph.from_edges(parse_summary.edges).quotient(path_to_package)
+    print(json.dumps(graph.adjacency_list(), indent=4))
+
+
+@click.command("dump_inline_packages")
+@click.pass_context
+def dump_inline_packages(ctx: click.Context) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    path_to_package: dict[str, str] = parse_summary.path_to_package()
+    inline_summary: dict[str, list[str]] = {}
+    for path, package in path_to_package.items():
+        if package is None:
+            continue
+        if package not in inline_summary:
+            inline_summary[package] = []
+        inline_summary[package].append(path)
+    print(json.dumps(inline_summary, indent=4))
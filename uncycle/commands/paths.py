@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from typing import List, Optional
+
+import json
+
+import click
+
+from ..graph import Graph, all_shortest_paths, reachable, shortest_path
+from ..package_view import PackageView
+
+
+@click.command("print_path")
+@click.argument("src", type=str)
+@click.argument("dst", type=str)
+@click.option(
+    "-a",
+    "--all-paths",
+    is_flag=True,
+    help="Output every shortest chain instead of one",
+)
+@click.option(
+    "--max-paths",
+    type=int,
+    default=100,
+    help="Maximum number of chains to output with `--all-paths`",
+)
+@click.option(
+    "-p",
+    "--packages",
+    is_flag=True,
+    help="Search the package graph; SRC and DST are package names",
+)
+@click.pass_context
+def print_path(
+    ctx: click.Context,
+    src: str,
+    dst: str,
+    all_paths: bool,
+    max_paths: int,
+    packages: bool,
+) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    graph = Graph.from_edges(parse_summary.edges, parse_summary.nodes)
+    view: Optional[PackageView] = None
+    if packages:
+        view = PackageView(graph, config.package_map(parse_summary.node_to_metadata))
+        graph = view.quotient()
+    for name in (src, dst):
+        if name not in graph.ids:
+            raise click.BadParameter(f"unknown node: {name}")
+
+    src_id, dst_id = graph.ids[src], graph.ids[dst]
+    if all_paths:
+        paths = all_shortest_paths(graph, src_id, dst_id, limit=max_paths)
+    else:
+        path = shortest_path(graph, src_id, dst_id)
+        paths = [path] if path else []
+    if not paths:
+        print(f"no path from {src} to {dst}")
+        return
+
+    names = graph.names
+    for path in paths:
+        print(" -> ".join(names[node] for node in path))
+    if view is not None:
+        hops = set(
+            (names[a], names[b]) for path in paths for a, b in zip(path, path[1:])
+        )
+        reps = view.representatives(hops)
+        for hop in sorted(hops):
+            print(f" {hop}:")
+            for r in reps.get(hop, []):
+                print(f"   {r}")
+
+
+def print_reachable(ctx: click.Context, files: List[str], reverse: bool) -> None:
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    graph = Graph.from_edges(parse_summary.edges, parse_summary.nodes)
+    nodes = []
+    for file in files:
+        if file in graph.ids:
+            nodes.append(graph.ids[file])
+        else:
+            click.echo(f"ignoring unknown file: {file}", err=True)
+    result = reachable(graph, nodes, reverse=reverse)
+    print(json.dumps([graph.names[node] for node in result], indent=4))
+
+
+@click.command("print_impacted")
+@click.argument("files", nargs=-1, type=str)
+@click.pass_context
+def print_impacted(ctx: click.Context, files: List[str]) -> None:
+    print_reachable(ctx, files, reverse=True)
+
+
+@click.command("print_dependencies")
+@click.argument("files", nargs=-1, type=str)
+@click.pass_context
+def print_dependencies(ctx: click.Context, files: List[str]) -> None:
+    print_reachable(ctx, files, reverse=False)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+import signal
+import sys
+
+import click
+
+from ..serve import QueryServer, serve_socket, serve_stream
+
+
+@click.command("serve")
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Listen on this Unix socket instead of reading stdin",
+)
+@click.pass_context
+def serve(ctx: click.Context, socket_path: Optional[Path]) -> None:
+    """
+    Parse the directory once, then answer one JSON request per line, eg.
+    `{"op": "used_by", "node": "a.py"}`, on stdout or over a Unix socket. Supported
+    ops are used_by, imports, leafs, package_graph, cycles, path and reload.
+    """
+    config = ctx.obj
+    server = QueryServer(config)
+    if socket_path is None:
+        serve_stream(server, sys.stdin, sys.stdout)
+    else:
+        # exit cleanly on SIGTERM, so the socket file is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        serve_socket(
+            server,
+            socket_path,
+            ready=lambda: click.echo(f"listening on {socket_path}", err=True),
+        )
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import click
+
+from ..hooks import phase
+from ..parse_summary import ParseSummary
+from ..snapshot import diff_summaries, read_snapshot, write_snapshot
+
+
+@click.command("snapshot")
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    required=True,
+    help="Snapshot file to write",
+)
+@click.pass_context
+def snapshot(ctx: click.Context, output: Path) -> None:
+    """
+    Save the files, imports and file metadata of the directory to OUTPUT, to be
+    compared later with `diff`.
+    """
+    config = ctx.obj
+    parse_summary = config.build_parse_summary()
+    with phase("snapshot", nodes=len(parse_summary.nodes)):
+        write_snapshot(parse_summary, output)
+
+
+def load_snapshot_file(path: Path) -> ParseSummary:
+    try:
+        return read_snapshot(path)
+    except ValueError as ex:
+        raise click.ClickException(f"{path}: {ex}")
+
+
+@click.command("diff")
+@click.argument("old", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument(
+    "new",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=False,
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Exit with status 1 if there are new cycles or new package dependencies",
+)
+@click.pass_context
+def diff(ctx: click.Context, old: Path, new: Optional[Path], check: bool) -> None:
+    """
+    Report the imports added and removed since the OLD snapshot, the new cycles and
+    the new dependencies between packages. NEW is a second snapshot, or by default
+    the directory as it is now.
+    """
+    config = ctx.obj
+    with phase("snapshot"):
+        old_summary = load_snapshot_file(old)
+        if new is not None:
+            new_summary = load_snapshot_file(new)
+    if new is None:
+        new_summary = config.build_parse_summary()
+
+    with phase("diff"):
+        result = diff_summaries(
+            old_summary,
+            new_summary,
+            config.package_map(old_summary.node_to_metadata),
+            config.package_map(new_summary.node_to_metadata),
+        )
+
+    def print_edges(title: str, edges: List[Tuple[str, str]], sign: str) -> None:
+        print(f"{title}: {len(edges)}")
+        for src, dst in edges:
+            print(f"  {sign} {src} -> {dst}")
+
+    print_edges("added edges", result.added_edges, "+")
+    print_edges("removed edges", result.removed_edges, "-")
+    print(f"new cycles: {len(result.new_sccs)}")
+    for scc in result.new_sccs:
+        print(f"  {', '.join(scc)}")
+    print_edges("added package edges", result.added_package_edges, "+")
+    print_edges("removed package edges", result.removed_package_edges, "-")
+    if check and (result.new_sccs or result.added_package_edges):
+        ctx.exit(1)
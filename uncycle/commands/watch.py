@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import sys
+import time
+
+import click
+
+from ..parse_summary import ParseState
+
+
+@click.command(
+    "watch",
+    context_settings=dict(ignore_unknown_options=True),
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    help="Seconds between polls of the directory",
+)
+@click.option(
+    "--iterations",
+    type=int,
+    default=None,
+    help="Stop after this many polls (default: run until interrupted)",
+)
+@click.argument("command_name", type=str)
+@click.argument("args", nargs=-1, type=click.UNPROCESSED)
+@click.pass_context
+def watch(
+    ctx: click.Context,
+    interval: float,
+    iterations: Optional[int],
+    command_name: str,
+    args: Tuple[str, ...],
+) -> None:
+    """
+    Keep the parse of the directory in memory and poll it for changes, re-running
+    COMMAND_NAME with ARGS after each change. Only changed files are parsed again
+    and their edges patched. The package views of `print_cycles` and `print_cut_set`
+    are kept too and patched with the changed edges; their components, cycles and
+    cut sets are only recomputed when a package edge appears or disappears. Other
+    commands rebuild their graphs from the patched edges. Each poll walks and stats
+    every python file.
+    """
+    config = ctx.obj
+    root = ctx.find_root()
+    assert isinstance(root.command, click.Group)
+    command = root.command.get_command(root, command_name)
+    if command is None or command_name == "watch":
+        raise click.UsageError(f"no such command: {command_name}")
+
+    def run() -> None:
+        try:
+            with command.make_context(command_name, list(args), parent=root) as sub_ctx:
+                sub_ctx.obj = config
+                command.invoke(sub_ctx)
+        except click.exceptions.Exit:
+            pass
+        except click.ClickException as ex:
+            ex.show()
+        except Exception as ex:
+            click.echo(f"{command_name} failed: {ex!r}", err=True)
+        sys.stdout.flush()
+
+    config.parse_state = ParseState(
+        config.dir_path,
+        config.excluded_paths,
+        config.top_level_only,
+        cache=config.cache,
+        jobs=config.jobs,
+        prefetch=config.prefetch,
+    )
+    run()
+    polls = 0
+    while iterations is None or polls < iterations:
+        time.sleep(interval)
+        polls += 1
+        try:
+            changed = config.parse_state.refresh()
+        except (OSError, SyntaxError, ValueError) as ex:
+            click.echo(f"parse failed, retrying: {ex}", err=True)
+            continue
+        if changed:
+            click.echo(f"=== {len(changed)} file(s) changed: {', '.join(changed)}")
+            run()
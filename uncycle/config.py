@@ -1,9 +1,12 @@
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, FrozenSet, List, Optional, Tuple
 
+from .cache import ParseCache
 from .file_metadata import FileMetadata
-from .parse_summary import build_parse_summary, ParseSummary
+from .graph import Graph
+from .package_view import PackageView
+from .parse_summary import build_parse_summary, ParseState, ParseSummary
 
 
 @dataclass
@@ -13,6 +16,14 @@ class Config:
     package_contents: Dict[str, List[str]]
     top_level_only: bool
     excluded_paths: List[Path] = field(default_factory=list)
+    cache: Optional[ParseCache] = None
+    jobs: int = 1
+    prefetch: int = 0
+    parse_state: Optional[ParseState] = None
+    # package views kept by `watch`, by their mapping
+    package_views: Dict[FrozenSet[Tuple[str, str]], PackageView] = field(
+        default_factory=dict
+    )
 
     def package_map(
         self, node_metadata: Dict[str, FileMetadata] = {}
@@ -32,6 +43,37 @@ class Config:
         return {Path(k): v for k, v in self.package_map(node_metadata).items()}
 
     def build_parse_summary(self) -> ParseSummary:
+        if self.parse_state is not None:
+            return self.parse_state.summary()
         return build_parse_summary(
-            self.dir_path, self.excluded_paths, top_level_only=self.top_level_only
+            self.dir_path,
+            self.excluded_paths,
+            top_level_only=self.top_level_only,
+            cache=self.cache,
+            jobs=self.jobs,
+            prefetch=self.prefetch,
         )
+
+    def package_view(self, path_to_package: Dict[str, str]) -> PackageView:
+        """
+        The package view of the parsed files. Under `watch` it's kept between runs
+        and patched by each refresh, so its quotient and memoized analyses are only
+        recomputed when a package edge appears or disappears.
+        """
+        state = self.parse_state
+        if state is None:
+            summary = self.build_parse_summary()
+            return PackageView(Graph.from_edges(summary.edges), path_to_package)
+        key = frozenset(path_to_package.items())
+        view = self.package_views.get(key)
+        if view is None:
+
+            def build_graph() -> Graph:
+                return Graph.from_edges(state.edges, state.nodes)
+
+            view = new_view = PackageView(build_graph(), path_to_package)
+            state.listeners.append(
+                lambda nodes, edges: new_view.patch(nodes, edges, build_graph)
+            )
+            self.package_views[key] = view
+        return view
@@ -1,3 +1,69 @@
-from typing import Tuple
+from __future__ import annotations
+
+from array import array
+from typing import Any, Iterable, Iterator, List, Sequence, Tuple, Union, overload
 
 Edge = Tuple[str, str]
+
+
+class EdgeList(Sequence[Edge]):
+    """
+    A read-only list of edges, stored as two `array("I")` buffers of indices into a
+    list of node names: 8 bytes per edge instead of a tuple and two pointers. Edge
+    tuples are created on access, and it compares equal to a `list` of the same edges.
+    """
+
+    __slots__ = ("names", "srcs", "dsts")
+
+    def __init__(self, names: List[str], srcs: array, dsts: array):
+        self.names = names
+        self.srcs = srcs
+        self.dsts = dsts
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[Edge], names: List[str]) -> EdgeList:
+        """
+        Store `edges`, whose endpoints must all be in `names`.
+        """
+        ids = {name: idx for idx, name in enumerate(names)}
+        srcs = array("I")
+        dsts = array("I")
+        for src, dst in edges:
+            srcs.append(ids[src])
+            dsts.append(ids[dst])
+        return cls(names, srcs, dsts)
+
+    def __len__(self) -> int:
+        return len(self.srcs)
+
+    @overload
+    def __getitem__(self, idx: int) -> Edge: ...
+
+    @overload
+    def __getitem__(self, idx: slice) -> List[Edge]: ...
+
+    def __getitem__(self, idx: Union[int, slice]) -> Union[Edge, List[Edge]]:
+        names = self.names
+        if isinstance(idx, slice):
+            return [
+                (names[src], names[dst])
+                for src, dst in zip(self.srcs[idx], self.dsts[idx])
+            ]
+        return names[self.srcs[idx]], names[self.dsts[idx]]
+
+    def __iter__(self) -> Iterator[Edge]:
+        names = self.names
+        for src, dst in zip(self.srcs, self.dsts):
+            yield names[src], names[dst]
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, EdgeList) and other.names is self.names:
+            return self.srcs == other.srcs and self.dsts == other.dsts
+        if isinstance(other, (EdgeList, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"EdgeList({list(self)!r})"
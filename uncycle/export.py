@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from array import array
+from typing import Callable, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+import heapq
+import json
+
+from .graph import (
+    Graph,
+    is_cyclic_component,
+    shortest_cycles,
+    strongly_connected_components,
+)
+from .package_view import PackageView
+
+
+# source id, destination id and weight
+WeightedEdge = Tuple[int, int, int]
+
+
+@dataclass
+class ExportGraph:
+    """
+    A graph ready to be written out: node names, the cluster (package) of each node
+    if any, and the number of kept edges. `edges` streams the weighted edges between
+    node ids, sorted, from the underlying graph each time it is called.
+    """
+
+    names: List[str]
+    clusters: List[Optional[str]]
+    edge_count: int
+    edge_source: Callable[[], Iterator[WeightedEdge]]
+
+    def edges(self) -> Iterator[WeightedEdge]:
+        return self.edge_source()
+
+
+def _cyclic_subgraph(
+    graph: Graph, cycles_only: bool
+) -> Tuple[Set[int], Callable[[int, int], bool]]:
+    # the nodes and a test for the edges of the cyclic components, or of the
+    # shortest cycles through their nodes
+    sccs = [
+        scc
+        for scc in strongly_connected_components(graph)
+        if is_cyclic_component(graph, scc)
+    ]
+    if cycles_only:
+        on_cycles: Set[Tuple[int, int]] = set()
+        cycles, _ = shortest_cycles(graph, sccs)
+        for cycle in cycles:
+            on_cycles.update(zip(cycle, cycle[1:] + cycle[:1]))
+        nodes = {node for edge in on_cycles for node in edge}
+        return nodes, lambda src, dst: (src, dst) in on_cycles
+    component_of = array("i", [-1]) * len(graph)
+    for idx, scc in enumerate(sccs):
+        for node in scc:
+            component_of[node] = idx
+    nodes = {node for scc in sccs for node in scc}
+    return nodes, lambda src, dst: component_of[src] == component_of[dst] >= 0
+
+
+def build_export_graph(
+    graph: Graph,
+    path_to_package: Dict[str, str],
+    packages: bool = False,
+    only: str = "all",
+    max_nodes: int = 0,
+    max_edges: int = 0,
+) -> Tuple[ExportGraph, int, int]:
+    """
+    Prepare `graph` for export, along with its node and edge counts before capping.
+
+    Files are clustered by `path_to_package`. With `packages`, the package graph is
+    exported instead, each edge weighted by the number of file imports behind it.
+    `only` is "all", "sccs" for the edges within cyclic strongly connected
+    components or "cycles" for the edges of a shortest cycle through each node on
+    one. `max_nodes` keeps the nodes of highest weighted degree, then `max_edges`
+    the heaviest edges; 0 means no cap. Ties are broken by name.
+
+    Edges are never collected: they are streamed from `graph`, or the package view,
+    with a counting pass for each filter, except for the `max_edges` heaviest.
+    """
+    clusters: List[Optional[str]]
+    if packages:
+        view = PackageView(graph, path_to_package)
+        graph = view.quotient()
+        edge_counts = view.edge_counts
+        clusters = [None] * len(graph)
+    else:
+        edge_counts = None
+        clusters = [path_to_package.get(name) for name in graph.names]
+    names = graph.names
+
+    def all_edges() -> Iterator[WeightedEdge]:
+        for src in range(len(names)):
+            for dst in graph.successors(src):
+                if edge_counts is None:
+                    yield src, dst, 1
+                else:
+                    yield src, dst, edge_counts[names[src], names[dst]]
+
+    keep_edge: Optional[Callable[[int, int], bool]] = None
+    nodes: Set[int] = set(range(len(names)))
+    if only != "all":
+        nodes, keep_edge = _cyclic_subgraph(graph, only == "cycles")
+
+    def kept_edges() -> Iterator[WeightedEdge]:
+        if keep_edge is None:
+            return all_edges()
+        return (edge for edge in all_edges() if keep_edge(edge[0], edge[1]))
+
+    node_count = len(nodes)
+    if keep_edge is None:
+        edge_count = graph.edge_count()
+    else:
+        edge_count = sum(1 for _ in kept_edges())
+    kept_count = edge_count
+    edge_source = kept_edges
+
+    if max_nodes and len(nodes) > max_nodes:
+        degree = dict.fromkeys(nodes, 0)
+        for src, dst, weight in kept_edges():
+            degree[src] += weight
+            degree[dst] += weight
+        ranked = sorted(nodes, key=lambda node: (-degree[node], names[node]))
+        nodes = set(ranked[:max_nodes])
+
+        def capped_edges() -> Iterator[WeightedEdge]:
+            for edge in kept_edges():
+                if edge[0] in nodes and edge[1] in nodes:
+                    yield edge
+
+        edge_source = capped_edges
+        kept_count = sum(1 for _ in edge_source())
+    if max_edges and kept_count > max_edges:
+        # as a stable sort by descending weight, so ties keep the sorted order
+        heaviest = heapq.nlargest(max_edges, edge_source(), key=lambda edge: edge[2])
+        heaviest.sort()
+
+        def heaviest_edges() -> Iterator[WeightedEdge]:
+            return iter(heaviest)
+
+        edge_source = heaviest_edges
+        kept_count = len(heaviest)
+
+    # renumber the kept nodes
+    kept = sorted(nodes)
+    new_id = array("i", [-1]) * len(names)
+    for idx, node in enumerate(kept):
+        new_id[node] = idx
+
+    def renumbered() -> Iterator[WeightedEdge]:
+        for src, dst, weight in edge_source():
+            yield new_id[src], new_id[dst], weight
+
+    export = ExportGraph(
+        names=[names[node] for node in kept],
+        clusters=[clusters[node] for node in kept],
+        edge_count=kept_count,
+        edge_source=renumbered,
+    )
+    return export, node_count, edge_count
+
+
+def _dot_id(name: str) -> str:
+    return '"' + name.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def write_dot(graph: ExportGraph, out: TextIO) -> None:
+    """
+    Write `graph` in Graphviz DOT format, one line per node and edge, with a
+    `cluster_` subgraph per package. Edges of weight above 1 are labelled with it.
+    """
+    out.write("digraph uncycle {\n")
+    by_cluster: Dict[str, List[int]] = {}
+    for node, cluster in enumerate(graph.clusters):
+        if cluster is not None:
+            by_cluster.setdefault(cluster, []).append(node)
+    for idx, cluster in enumerate(sorted(by_cluster)):
+        out.write(f"  subgraph cluster_{idx} {{\n    label={_dot_id(cluster)};\n")
+        for node in by_cluster[cluster]:
+            out.write(f"    {_dot_id(graph.names[node])};\n")
+        out.write("  }\n")
+    for node, cluster in enumerate(graph.clusters):
+        if cluster is None:
+            out.write(f"  {_dot_id(graph.names[node])};\n")
+    ids = [_dot_id(name) for name in graph.names]
+    for src, dst, weight in graph.edges():
+        if weight > 1:
+            out.write(
+                f'  {ids[src]} -> {ids[dst]} [weight={weight}, label="{weight}"];\n'
+            )
+        else:
+            out.write(f"  {ids[src]} -> {ids[dst]};\n")
+    out.write("}\n")
+
+
+def write_graphml(graph: ExportGraph, out: TextIO) -> None:
+    """
+    Write `graph` as GraphML, with a `package` attribute on clustered nodes and a
+    `weight` attribute on every edge.
+    """
+    out.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+        '  <key id="package" for="node" attr.name="package" attr.type="string"/>\n'
+        '  <key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n'
+        '  <graph id="uncycle" edgedefault="directed">\n'
+    )
+    ids = [quoteattr(name) for name in graph.names]
+    for node, cluster in enumerate(graph.clusters):
+        if cluster is None:
+            out.write(f"    <node id={ids[node]}/>\n")
+        else:
+            out.write(
+                f"    <node id={ids[node]}>"
+                f'<data key="package">{escape(cluster)}</data></node>\n'
+            )
+    for src, dst, weight in graph.edges():
+        out.write(
+            f"    <edge source={ids[src]} target={ids[dst]}>"
+            f'<data key="weight">{weight}</data></edge>\n'
+        )
+    out.write("  </graph>\n</graphml>\n")
+
+
+def write_json(graph: ExportGraph, out: TextIO) -> None:
+    """
+    Write `graph` as a JSON object with a `nodes` list of `{"id", "package"}` and an
+    `edges` list of `{"source", "target", "weight"}`, one item per line.
+    """
+    out.write('{\n  "nodes": [')
+    separator = "\n    "
+    for name, cluster in zip(graph.names, graph.clusters):
+        out.write(separator + json.dumps({"id": name, "package": cluster}))
+        separator = ",\n    "
+    out.write('\n  ],\n  "edges": [')
+    separator = "\n    "
+    names = graph.names
+    for src, dst, weight in graph.edges():
+        edge = {"source": names[src], "target": names[dst], "weight": weight}
+        out.write(separator + json.dumps(edge))
+        separator = ",\n    "
+    out.write("\n  ]\n}\n")
+
+
+WRITERS: Dict[str, Callable[[ExportGraph, TextIO], None]] = {
+    "dot": write_dot,
+    "graphml": write_graphml,
+    "json": write_json,
+}
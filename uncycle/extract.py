@@ -1,31 +1,21 @@
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 
+from array import array
+
+import bisect
+import fnmatch
 import os
 import pprint
 
 from .config import Config
-from .edge import Edge
-from .graph import edges_to_adjacency_list
-from .parse_summary import FileMetadata, build_parse_summary
+from .graph import Graph, shortest_path
+from .parse_summary import FileMetadata
 
 
 TreeData = Tuple[str, List["TreeData"], List[str]]
 
 
-def package_edges_for_path_edges(
-    edges: List[Edge], path_to_package: Dict[str, str]
-) -> List[Edge]:
-    package_edges_set = set()
-    for edge in edges:
-        p0, p1 = [path_to_package.get(_, _) for _ in edge]
-        if p0 == p1:
-            continue
-        package_edge = (p0, p1)
-        package_edges_set.add(package_edge)
-    return sorted(package_edges_set)
-
-
 def dump(target: str) -> None:
     print(target)
 
@@ -54,10 +44,86 @@ def rebuild_potential_nodes(
     return potential_nodes
 
 
+class PeelState:
+    """
+    Incrementally tracks the potential nodes of `rebuild_potential_nodes`.
+
+    For each file not yet in a package we keep the number of distinct package-level
+    targets it imports that are not safe. A file is ready to move once this count
+    drops to zero. Moving a file into the new package only changes the counts of the
+    files importing it, and rejecting a file only removes it from the ready list, so
+    each decision costs O(degree) instead of rebuilding the whole package graph.
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        path_to_package: Dict[str, str],
+        new_module_name: str,
+        safe_targets: Set[str],
+        nodes_previously_rejected: Set[str],
+        metadata_lookup: Dict[str, FileMetadata],
+    ):
+        self.graph = graph
+        self.path_to_package = path_to_package
+        self.new_module_name = new_module_name
+        self.nodes_previously_rejected = nodes_previously_rejected
+        self.metadata_lookup = metadata_lookup
+        names = graph.names
+        self.unassigned = bytearray(len(graph))
+        self.unsafe_count = array("i", [0]) * len(graph)
+        for node, name in enumerate(names):
+            if path_to_package.get(name, name) != name:
+                continue
+            self.unassigned[node] = 1
+            unsafe_targets = set()
+            for dst in graph.successors(node):
+                package = path_to_package.get(names[dst], names[dst])
+                if package != name and package not in safe_targets:
+                    unsafe_targets.add(package)
+            self.unsafe_count[node] = len(unsafe_targets)
+        self.potential_nodes = [
+            name
+            for node, name in enumerate(names)
+            if self.unassigned[node]
+            and self.unsafe_count[node] == 0
+            and self.is_candidate(name)
+        ]
+
+    def is_candidate(self, node: str) -> bool:
+        return (
+            node not in self.nodes_previously_rejected and node in self.metadata_lookup
+        )
+
+    def _discard_potential_node(self, node: str) -> None:
+        idx = bisect.bisect_left(self.potential_nodes, node)
+        if idx < len(self.potential_nodes) and self.potential_nodes[idx] == node:
+            del self.potential_nodes[idx]
+
+    def move(self, node: str) -> None:
+        """
+        Move the potential node `node` into the new package, which is a safe target.
+        """
+        self.path_to_package[node] = self.new_module_name
+        self._discard_potential_node(node)
+        node_id = self.graph.ids[node]
+        self.unassigned[node_id] = 0
+        for importer in self.graph.predecessors(node_id):
+            if not self.unassigned[importer]:
+                continue
+            self.unsafe_count[importer] -= 1
+            name = self.graph.names[importer]
+            if self.unsafe_count[importer] == 0 and self.is_candidate(name):
+                bisect.insort(self.potential_nodes, name)
+
+    def reject(self, node: str) -> None:
+        self.nodes_previously_rejected.add(node)
+        self._discard_potential_node(node)
+
+
 def process_next_potential_node(
     base_path: Path,
-    path_nodes: List[str],
-    path_edges: List[Edge],
+    graph: Graph,
     path_to_package: Dict[str, str],
     new_module_name: str,
     safe_targets: Set[str],
@@ -67,16 +133,18 @@ def process_next_potential_node(
 ) -> None:
     target = None
     prior_target = ""
+    state = PeelState(
+        graph,
+        path_to_package,
+        new_module_name,
+        safe_targets,
+        nodes_previously_rejected,
+        metadata_lookup,
+    )
 
     while True:
         if target is None:
-            package_edges = package_edges_for_path_edges(path_edges, path_to_package)
-
-            package_nodes = sorted(path_to_package.get(_, _) for _ in path_nodes)
-            adj_list = edges_to_adjacency_list(package_edges, nodes=package_nodes)
-            potential_nodes = rebuild_potential_nodes(
-                adj_list, nodes_previously_rejected, metadata_lookup, safe_targets
-            )
+            potential_nodes = state.potential_nodes
             if len(potential_nodes) == 0:
                 break
             for pn in potential_nodes:
@@ -100,6 +168,7 @@ def process_next_potential_node(
         print(f"  n: reject `{target}` from {new_module_name} and remove from list")
         print(f'  u: list all nodes "used by" `{target}`')
         print(f'  i: list all nodes "imported" by `{target}`')
+        print(f"  p: show the shortest import chain from `{target}` to another node")
         print("  q: quit")
         print("int: choose a different node to consider")
 
@@ -117,6 +186,23 @@ def process_next_potential_node(
             for used_by in used_by_list:
                 print(f"{used_by}")
             print()
+        if r == "i":
+            imported = [graph.names[dst] for dst in graph.successors(graph.ids[target])]
+            print("*******")
+            print(f"{target} imports the following {len(imported):3d} file(s)")
+            for node in imported:
+                package = path_to_package.get(node)
+                print(f"{node}" + (f" ({package})" if package else ""))
+            print()
+        if r == "p":
+            dst = input("to: ").strip()
+            path = []
+            if dst in graph.ids:
+                path = shortest_path(graph, graph.ids[target], graph.ids[dst])
+            if path:
+                print(" -> ".join(graph.names[node] for node in path))
+            else:
+                print(f"no path from {target} to {dst}")
         if r == "":
             for idx, node in enumerate(potential_nodes):
                 md = metadata_lookup[node]
@@ -138,11 +224,11 @@ def process_next_potential_node(
             continue
         if r == "y":
             print(f"Moving {target} to {new_module_name}")
-            path_to_package[target] = new_module_name
+            state.move(target)
             target = None
         if r == "n":
             if target is not None:
-                nodes_previously_rejected.add(target)
+                state.reject(target)
             print(f"Rejecting {target}")
             target = None
 
@@ -150,33 +236,69 @@ def process_next_potential_node(
         print("No potential nodes found. We are done.")
 
 
-def extract(config: Config, new_module_name: str, top: bool) -> None:
-    parse_summary = build_parse_summary(config.dir_path, config.excluded_paths)
-    nodes = parse_summary.nodes
+def peel_all_layers(state: PeelState) -> List[List[str]]:
+    """
+    Repeatedly move every potential node into the new package until none are left,
+    ie. Kahn's algorithm on the package graph. Returns the peeled layers in order.
+    """
+    layers = []
+    while state.potential_nodes:
+        layer = list(state.potential_nodes)
+        for node in layer:
+            state.move(node)
+        layers.append(layer)
+    return layers
+
 
-    path_edges = list(parse_summary.edges)
+def extract(
+    config: Config,
+    new_module_name: str,
+    top: bool,
+    auto: bool = False,
+    max_lines: Optional[int] = None,
+    exclude: List[str] = [],
+) -> None:
+    parse_summary = config.build_parse_summary()
+    graph = Graph.from_edges(parse_summary.edges, parse_summary.nodes)
     if top:
-        path_edges = [(dst, src) for src, dst in path_edges]
+        graph = graph.reversed()
     path_to_package = config.package_map()
     safe_targets = set([new_module_name])
     nodes_previously_rejected = set([new_module_name])
     metadata = parse_summary.node_to_metadata
 
-    used_by_lookup: Dict[str, List[str]] = {k: [] for k in nodes}
-    for s, d in path_edges:
-        used_by_lookup[d].append(s)
+    used_by_lookup: Dict[str, List[str]] = {
+        name: [graph.names[src] for src in graph.predecessors(node)]
+        for node, name in enumerate(graph.names)
+    }
 
-    process_next_potential_node(
-        config.dir_path,
-        nodes,
-        path_edges,
-        path_to_package,
-        new_module_name,
-        safe_targets,
-        nodes_previously_rejected,
-        metadata,
-        used_by_lookup,
-    )
+    if auto:
+        for node, md in metadata.items():
+            if any(fnmatch.fnmatch(node, pattern) for pattern in exclude) or (
+                max_lines is not None and md.line_count > max_lines
+            ):
+                nodes_previously_rejected.add(node)
+        state = PeelState(
+            graph,
+            path_to_package,
+            new_module_name,
+            safe_targets,
+            nodes_previously_rejected,
+            metadata,
+        )
+        for idx, layer in enumerate(peel_all_layers(state)):
+            print(f"layer {idx}: {layer}")
+    else:
+        process_next_potential_node(
+            config.dir_path,
+            graph,
+            path_to_package,
+            new_module_name,
+            safe_targets,
+            nodes_previously_rejected,
+            metadata,
+            used_by_lookup,
+        )
 
     mod_paths = []
     for k, v in path_to_package.items():
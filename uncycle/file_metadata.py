@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 
 @dataclass(frozen=True)
 class FileMetadata:
+    # one instance per file, so no per-instance `__dict__`
+    __slots__ = ("line_count", "inline_package")
+
     line_count: int
     inline_package: Optional[str]
+
+    def __reduce__(self) -> Tuple[type, Tuple[int, Optional[str]]]:
+        # frozen slots can't be restored by the default `__setstate__`
+        return FileMetadata, (self.line_count, self.inline_package)
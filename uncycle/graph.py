@@ -1,9 +1,24 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from array import array
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
-from uncycle.edge import Edge
+import bisect
+import heapq
+
+from uncycle.backend import sparse_backend
+from uncycle.edge import Edge, EdgeList
+from uncycle.hooks import timed_phase
 
 
 EdgePath = None | Tuple[str, "EdgePath"]
@@ -31,9 +46,14 @@ def remap_edges(
     edges: List[Edge],
     mapping: Dict[str, str],
     drop_missing=True,
-) -> Tuple[List[Edge], Dict[Edge, List[Edge]]]:
+) -> Tuple[List[Edge], Mapping[Edge, List[Edge]]]:
+    """
+    Return the sorted, distinct edges obtained by replacing each node by
+    `mapping[node]`, dropping edges within a group, along with a lookup from each
+    new edge to the original edges it stands for. The lookup is a `ReverseLookup`,
+    only built if it's used.
+    """
     s: Set[Edge] = set()
-    reverse_lookup: Dict[Edge, List[Edge]] = {}
     for src, dst in edges:
         s0 = mapping.get(src)
         d0 = mapping.get(dst)
@@ -42,10 +62,69 @@ def remap_edges(
             d0 = d0 if d0 is not None else dst
         if s0 is not None and d0 is not None and s0 != d0:
             s.add((s0, d0))
-            reverse_lookup.setdefault((s0, d0), []).append((src, dst))
-    return sorted(s), reverse_lookup
+    return sorted(s), ReverseLookup(edges, mapping, drop_missing)
+
+
+def edge_representatives(
+    edges: Iterable[Edge],
+    mapping: Dict[str, str],
+    wanted: Optional[Set[Edge]],
+    drop_missing=True,
+) -> Dict[Edge, List[Edge]]:
+    """
+    Return the part of the `remap_edges` reverse lookup for the remapped edges in
+    `wanted`, without building it for every other edge. If `wanted` is `None`, the
+    whole reverse lookup is returned.
+    """
+    reverse_lookup: Dict[Edge, List[Edge]] = {}
+    for src, dst in edges:
+        s0 = mapping.get(src)
+        d0 = mapping.get(dst)
+        if not drop_missing:
+            s0 = s0 if s0 is not None else src
+            d0 = d0 if d0 is not None else dst
+        if wanted is None:
+            if s0 is None or d0 is None or s0 == d0:
+                continue
+        elif (s0, d0) not in wanted:
+            continue
+        reverse_lookup.setdefault((s0, d0), []).append((src, dst))
+    return reverse_lookup
+
+
+class ReverseLookup(Mapping[Edge, List[Edge]]):
+    """
+    The reverse lookup returned by `remap_edges`. Few callers use it, and it holds
+    every original edge, so it's only built on first access. `edges` and `mapping`
+    must not change until then.
+    """
 
+    def __init__(self, edges: List[Edge], mapping: Dict[str, str], drop_missing=True):
+        self._args: Optional[Tuple[List[Edge], Dict[str, str], bool]] = (
+            edges,
+            mapping,
+            drop_missing,
+        )
+        self._lookup: Dict[Edge, List[Edge]] = {}
 
+    def lookup(self) -> Dict[Edge, List[Edge]]:
+        if self._args is not None:
+            edges, mapping, drop_missing = self._args
+            self._lookup = edge_representatives(edges, mapping, None, drop_missing)
+            self._args = None
+        return self._lookup
+
+    def __getitem__(self, edge: Edge) -> List[Edge]:
+        return self.lookup()[edge]
+
+    def __iter__(self) -> Iterator[Edge]:
+        return iter(self.lookup())
+
+    def __len__(self) -> int:
+        return len(self.lookup())
+
+
+@timed_phase("graph.transitive_path_lookup")
 def generate_transitive_path_lookup(
     edges: List[Edge],
 ) -> Dict[str, Dict[str, List[EdgePath]]]:
@@ -90,18 +169,1029 @@ def edge_path_as_node_list(path: EdgePath) -> List[str]:
     return node_list
 
 
-def is_excluded(file_path: Path, excluded_paths: List[Path]) -> bool:
-    file_path = file_path.resolve()  # Normalize the file path
+class Graph:
+    """
+    A compact directed graph. Node names are interned to integer ids, assigned in
+    sorted name order, and the forward and reverse adjacency are stored CSR-style in
+    `array("i")` buffers. So memory and build time scale with the number of edges
+    rather than with Python object overhead.
 
-    for excluded_path in excluded_paths:
-        excluded_path = excluded_path.resolve()  # Normalize the excluded path
-        # Check if the file path matches the excluded path exactly
-        if file_path == excluded_path:
-            return True
-        # Check if the excluded path is a directory and if the file is under this directory
-        if excluded_path.is_dir() and any(
-            parent == excluded_path for parent in file_path.parents
-        ):
-            return True
+    Parallel edges are merged. Successors and predecessors of a node are sorted by
+    id, which is also sorted by name.
+    """
+
+    def __init__(self, names: List[str], edges: Iterable[Tuple[int, int]]):
+        self.names = names
+        self.ids: Dict[str, int] = {name: idx for idx, name in enumerate(names)}
+        n = len(names)
+        codes = sorted({src * n + dst for src, dst in edges})
+        self.offsets, self.targets = self._csr(n, codes)
+        rev_codes = sorted((code % n) * n + code // n for code in codes) if n else []
+        self.rev_offsets, self.sources = self._csr(n, rev_codes)
+
+    @staticmethod
+    def _csr(n: int, codes: List[int]) -> Tuple[array, array]:
+        offsets = array("i", [0]) * (n + 1)
+        targets = array("i", [code % n for code in codes])
+        for code in codes:
+            offsets[code // n + 1] += 1
+        for idx in range(n):
+            offsets[idx + 1] += offsets[idx]
+        return offsets, targets
+
+    @classmethod
+    @timed_phase("graph.from_edges")
+    def from_edges(cls, edges: Iterable[Edge], nodes: Iterable[str] = ()) -> Graph:
+        if isinstance(edges, EdgeList):
+            return cls._from_edge_list(edges, nodes)
+        edges = list(edges)
+        names_set = set(nodes)
+        for src, dst in edges:
+            names_set.add(src)
+            names_set.add(dst)
+        names = sorted(names_set)
+        ids = {name: idx for idx, name in enumerate(names)}
+        return cls(names, ((ids[src], ids[dst]) for src, dst in edges))
+
+    @classmethod
+    def from_csr(
+        cls,
+        names: List[str],
+        offsets: array,
+        targets: array,
+        rev_offsets: array,
+        sources: array,
+    ) -> Graph:
+        """
+        Wrap CSR buffers laid out as `Graph` stores them, without copying them.
+        """
+        graph = cls.__new__(cls)
+        graph.names = names
+        graph.ids = {name: idx for idx, name in enumerate(names)}
+        graph.offsets, graph.targets = offsets, targets
+        graph.rev_offsets, graph.sources = rev_offsets, sources
+        return graph
+
+    @classmethod
+    def _from_edge_list(cls, edges: EdgeList, nodes: Iterable[str]) -> Graph:
+        sparse = sparse_backend(len(edges))
+        if sparse is not None:
+            return sparse.graph_from_edge_list(edges, nodes)
+        # remap the indices directly, without creating a tuple per edge
+        used = set(edges.srcs)
+        used.update(edges.dsts)
+        names_set = set(nodes)
+        names_set.update(edges.names[idx] for idx in used)
+        names = sorted(names_set)
+        ids = {name: idx for idx, name in enumerate(names)}
+        remap = {idx: ids[edges.names[idx]] for idx in used}
+        srcs = map(remap.__getitem__, edges.srcs)
+        dsts = map(remap.__getitem__, edges.dsts)
+        return cls(names, zip(srcs, dsts))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def successors(self, node: int) -> array:
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def predecessors(self, node: int) -> array:
+        return self.sources[self.rev_offsets[node] : self.rev_offsets[node + 1]]
+
+    def out_degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+    def in_degree(self, node: int) -> int:
+        return self.rev_offsets[node + 1] - self.rev_offsets[node]
+
+    def has_edge(self, src: int, dst: int) -> bool:
+        lo, hi = self.offsets[src], self.offsets[src + 1]
+        idx = bisect.bisect_left(self.targets, dst, lo, hi)
+        return idx < hi and self.targets[idx] == dst
+
+    def reversed(self) -> Graph:
+        """
+        Return the graph with all edges reversed. The buffers are shared, not copied.
+        """
+        graph = Graph.__new__(Graph)
+        graph.names, graph.ids = self.names, self.ids
+        graph.offsets, graph.targets = self.rev_offsets, self.sources
+        graph.rev_offsets, graph.sources = self.offsets, self.targets
+        return graph
+
+    def edges(self) -> Iterator[Edge]:
+        """
+        Generate all edges as `(src, dst)` name pairs, in sorted order.
+        """
+        names = self.names
+        for src in range(len(names)):
+            src_name = names[src]
+            for dst in self.successors(src):
+                yield src_name, names[dst]
+
+    def adjacency_list(self) -> Dict[str, List[str]]:
+        """
+        Return the same adjacency list as `edges_to_adjacency_list(graph.edges())`.
+        """
+        names = self.names
+        return {
+            names[src]: [names[dst] for dst in self.successors(src)]
+            for src in range(len(names))
+            if self.out_degree(src) > 0
+        }
+
+    def quotient(self, mapping: Dict[str, str], drop_missing: bool = True) -> Graph:
+        """
+        Return the graph obtained by merging nodes as `remap_edges` does: each node is
+        replaced by `mapping[node]`, edges within a group are dropped, and nodes
+        missing from `mapping` are dropped or, if `drop_missing` is false, kept as is.
+        """
+        group_names: List[Optional[str]] = []
+        for name in self.names:
+            group = mapping.get(name)
+            if group is None and not drop_missing:
+                group = name
+            group_names.append(group)
+        names = sorted({group for group in group_names if group is not None})
+        ids = {name: idx for idx, name in enumerate(names)}
+        group_ids = [-1 if group is None else ids[group] for group in group_names]
+        edges = []
+        for src in range(len(self.names)):
+            src_group = group_ids[src]
+            if src_group < 0:
+                continue
+            for dst in self.successors(src):
+                dst_group = group_ids[dst]
+                if dst_group >= 0 and dst_group != src_group:
+                    edges.append((src_group, dst_group))
+        return Graph(names, edges)
+
+
+@timed_phase("graph.strongly_connected_components")
+def strongly_connected_components(
+    graph: Graph, nodes: Optional[Iterable[int]] = None, canonical: bool = False
+) -> List[List[int]]:
+    """
+    Return the strongly connected components of the graph, or of the subgraph induced
+    by `nodes`, using an iterative version of Tarjan's algorithm, in O(V+E) time.
+
+    Each component is a sorted list of node ids. Components are returned in reverse
+    topological order: no component has an edge to a component appearing after it.
+    Which such order depends on the backend, unless `canonical` is set: then they
+    are put in the order of `order_components`, at the cost of another pass over
+    the edges.
+    """
+    if nodes is None:
+        sparse = sparse_backend(graph.edge_count())
+        if sparse is not None:
+            sccs = sparse.strongly_connected_components(graph, canonical)
+            if sccs is not None:
+                return sccs
+    if nodes is None:
+        sccs = _tarjan(len(graph), graph.successors)
+    else:
+        # renumber the subset so the work is sized to it rather than to the graph
+        members = sorted(set(nodes))
+        local = {node: idx for idx, node in enumerate(members)}
+        adjacency = [
+            [local[dst] for dst in graph.successors(node) if dst in local]
+            for node in members
+        ]
+        sccs = [
+            [members[idx] for idx in scc]
+            for scc in _tarjan(len(members), adjacency.__getitem__)
+        ]
+    if canonical:
+        return order_components(sccs, component_heights(graph, sccs))
+    return sccs
+
+
+def _tarjan(n: int, successors: Callable[[int], Iterable[int]]) -> List[List[int]]:
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = bytearray(n)
+    stack: List[int] = []
+    sccs: List[List[int]] = []
+    counter = 0
+    for root in range(n):
+        if index[root] >= 0:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = 1
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, succs = work[-1]
+            for succ in succs:
+                if index[succ] < 0:
+                    index[succ] = lowlink[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    on_stack[succ] = 1
+                    work.append((succ, iter(successors(succ))))
+                    break
+                if on_stack[succ] and index[succ] < lowlink[node]:
+                    lowlink[node] = index[succ]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index[node]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = 0
+                        scc.append(member)
+                        if member == node:
+                            break
+                    scc.sort()
+                    sccs.append(scc)
+    return sccs
+
+
+def component_heights(graph: Graph, sccs: List[List[int]]) -> List[int]:
+    """
+    Return the height of each component in the condensation, the length of the
+    longest path from it. `sccs` must be in reverse topological order.
+    """
+    # height of the component of each node, -1 until that component is reached, so
+    # edges within a component don't count
+    node_height = [-1] * len(graph)
+    height_of = node_height.__getitem__
+    successors = graph.successors
+    heights = []
+    for scc in sccs:
+        if len(scc) == 1:
+            height = max(map(height_of, successors(scc[0])), default=-1) + 1
+        else:
+            height = 1 + max(
+                max(map(height_of, successors(node)), default=-1) for node in scc
+            )
+        for node in scc:
+            node_height[node] = height
+        heights.append(height)
+    return heights
+
+
+def order_components(sccs: List[List[int]], heights: List[int]) -> List[List[int]]:
+    """
+    Sort components by their height in the condensation, then by smallest node.
+    Edges only go to lower heights, so this is a reverse topological order, and one
+    that depends only on the graph rather than on how the components were found.
+    """
+    # node ids are below the node count, so one int orders by height then node
+    n = sum(map(len, sccs))
+    keys = [height * n + scc[0] for height, scc in zip(heights, sccs)]
+    return [sccs[idx] for idx in sorted(range(len(sccs)), key=keys.__getitem__)]
+
+
+def is_cyclic_component(graph: Graph, scc: List[int]) -> bool:
+    return len(scc) > 1 or graph.has_edge(scc[0], scc[0])
+
+
+def leaf_nodes(graph: Graph, ignored: Iterable[int] = ()) -> List[int]:
+    """
+    Return the sorted nodes that have at least one predecessor, and no successors
+    other than `ignored` nodes.
+    """
+    sparse = sparse_backend(graph.edge_count())
+    if sparse is not None:
+        return sparse.leaf_nodes(graph, ignored)
+    ignored_set = set(ignored)
+    return [
+        node
+        for node in range(len(graph))
+        if graph.in_degree(node) > 0
+        and all(dst in ignored_set for dst in graph.successors(node))
+    ]
+
+
+def layers(
+    graph: Graph, ignored: Iterable[int] = ()
+) -> Tuple[List[List[int]], List[List[int]], List[List[int]]]:
+    """
+    Layer the graph in a single O(V+E) pass over its condensation, ignoring edges to
+    `ignored` nodes. Return the sorted nodes of each layer counted from the bottom,
+    where layer 0 holds the nodes with no edges out of their strongly connected
+    component and every other node is one layer above the highest it imports, then
+    the layers counted from the top likewise, then the cyclic components, which
+    always share a layer.
+    """
+    ignored_set = set(ignored)
+    if ignored_set:
+        graph = Graph(
+            graph.names,
+            (
+                (src, dst)
+                for src in range(len(graph))
+                for dst in graph.successors(src)
+                if dst not in ignored_set
+            ),
+        )
+    sccs = strongly_connected_components(graph)
+    component_of = array("i", [0]) * len(graph)
+    for idx, scc in enumerate(sccs):
+        for node in scc:
+            component_of[node] = idx
+
+    def heights(order: Iterable[int], neighbours: Callable[[int], array]) -> List[int]:
+        # neighbours of a component are always found earlier in `order`
+        height = [0] * len(sccs)
+        for idx in order:
+            best = 0
+            for node in sccs[idx]:
+                for other in neighbours(node):
+                    other_idx = component_of[other]
+                    if other_idx != idx and height[other_idx] >= best:
+                        best = height[other_idx] + 1
+            height[idx] = best
+        return height
+
+    def group(height: List[int]) -> List[List[int]]:
+        grouped: List[List[int]] = [[] for _ in range(max(height, default=-1) + 1)]
+        for idx, scc in enumerate(sccs):
+            grouped[height[idx]].extend(scc)
+        for layer in grouped:
+            layer.sort()
+        return grouped
+
+    # components are in reverse topological order
+    from_bottom = heights(range(len(sccs)), graph.successors)
+    from_top = heights(reversed(range(len(sccs))), graph.predecessors)
+    cyclic = sorted(scc for scc in sccs if is_cyclic_component(graph, scc))
+    return group(from_bottom), group(from_top), cyclic
+
+
+def shortest_cycle_through(graph: Graph, node: int, members: Set[int]) -> List[int]:
+    """
+    Return a shortest cycle through `node` as a list of nodes starting with `node`,
+    or an empty list if there is none. `members` is the strongly connected component
+    containing `node`; the search never leaves it.
+
+    Distances to `node` are found with a breadth-first search over reversed edges,
+    which stops at the first layer reaching a successor of `node`, so it only visits
+    the nodes within the length of the cycle. The cycle is then walked forward,
+    taking the lexicographically smallest successor that is still on a shortest path.
+    """
+    cycle, _ = _search_cycle_through(graph, node, members, None)
+    assert cycle is not None
+    return cycle
+
+
+def _search_cycle_through(
+    graph: Graph, node: int, members: Set[int], max_visits: Optional[int]
+) -> Tuple[Optional[List[int]], int]:
+    # as `shortest_cycle_through`, along with the number of edges visited, or `None`
+    # once more than `max_visits` would be
+    successors = graph.successors(node)
+    visits = len(successors)
+    targets = {dst for dst in successors if dst in members}
+    if node in targets:
+        return [node], visits
+    distance: Dict[int, int] = {node: 0}
+    frontier = [node]
+    remaining = 0
+    while frontier and not remaining:
+        next_frontier = []
+        for dst in frontier:
+            predecessors = graph.predecessors(dst)
+            visits += len(predecessors)
+            if max_visits is not None and visits > max_visits:
+                return None, visits
+            for src in predecessors:
+                if src in members and src not in distance:
+                    distance[src] = distance[dst] + 1
+                    next_frontier.append(src)
+                    if src in targets:
+                        remaining = distance[src]
+        frontier = next_frontier
+    if not remaining:
+        return [], visits
+
+    # the layers up to `remaining` are complete, so are all nodes on shortest paths
+    cycle = [node]
+    current = node
+    while remaining > 0:
+        visits += graph.out_degree(current)
+        current = next(
+            d for d in graph.successors(current) if distance.get(d, -1) == remaining
+        )
+        cycle.append(current)
+        remaining -= 1
+    if max_visits is not None and visits > max_visits:
+        return None, visits
+    return cycle, visits
 
-    return False
+
+def shortest_cycles(
+    graph: Graph,
+    sccs: Optional[List[List[int]]] = None,
+    max_visits: Optional[int] = None,
+) -> Tuple[List[List[int]], int]:
+    """
+    Return a shortest cycle through every node that lies on a cycle, each rotated to
+    start with its smallest node and without duplicates, sorted by length and nodes,
+    along with the number of such nodes left unsearched.
+    `sccs` are the strongly connected components of the graph if already known.
+
+    This runs one search per node, each up to O(E) within its component, so the
+    time is O(|SCC| * E) on a large component with long cycles. `max_visits` bounds
+    the edges visited by all searches together: nodes are searched in order until
+    it runs out, and the rest are counted as unsearched.
+    """
+    if sccs is None:
+        sccs = strongly_connected_components(graph)
+    cycles: Set[Tuple[int, ...]] = set()
+    visits = 0
+    unsearched = 0
+    # components come in a backend-dependent order, which would decide where the
+    # budget runs out
+    for scc in sorted(scc for scc in sccs if is_cyclic_component(graph, scc)):
+        members = set(scc)
+        for node in scc:
+            if unsearched:
+                unsearched += 1
+                continue
+            budget = None if max_visits is None else max_visits - visits
+            cycle, used = _search_cycle_through(graph, node, members, budget)
+            visits += used
+            if cycle is None:
+                unsearched += 1
+                continue
+            idx = cycle.index(min(cycle))
+            cycles.add(tuple(cycle[idx:] + cycle[:idx]))
+    cycle_list = [list(cycle) for cycle in sorted(cycles, key=lambda c: (len(c), c))]
+    return cycle_list, unsearched
+
+
+def bidirectional_search(
+    graph: Graph, src: int, dst: int
+) -> Tuple[Dict[int, int], Dict[int, int], List[int]]:
+    """
+    Breadth-first search forward from `src` and backward from `dst` at the same
+    time, always expanding the smaller frontier, until the searches meet.
+
+    Returns the distances from `src` and to `dst` found so far, and the sorted nodes
+    where the searches met. Every shortest path passes through exactly one of these
+    nodes, which is empty if `dst` is not reachable.
+    """
+    forward = {src: 0}
+    backward = {dst: 0}
+    if src == dst:
+        return forward, backward, [src]
+    forward_frontier = [src]
+    backward_frontier = [dst]
+    while forward_frontier and backward_frontier:
+        meet = []
+        next_frontier = []
+        if len(forward_frontier) <= len(backward_frontier):
+            for node in forward_frontier:
+                for succ in graph.successors(node):
+                    if succ not in forward:
+                        forward[succ] = forward[node] + 1
+                        next_frontier.append(succ)
+                        if succ in backward:
+                            meet.append(succ)
+            forward_frontier = next_frontier
+        else:
+            for node in backward_frontier:
+                for pred in graph.predecessors(node):
+                    if pred not in backward:
+                        backward[pred] = backward[node] + 1
+                        next_frontier.append(pred)
+                        if pred in forward:
+                            meet.append(pred)
+            backward_frontier = next_frontier
+        if meet:
+            length = min(forward[node] + backward[node] for node in meet)
+            return (
+                forward,
+                backward,
+                sorted(n for n in meet if forward[n] + backward[n] == length),
+            )
+    return forward, backward, []
+
+
+def all_shortest_paths(
+    graph: Graph, src: int, dst: int, limit: Optional[int] = None
+) -> List[List[int]]:
+    """
+    Return the shortest paths from `src` to `dst`, at most `limit` of them, as
+    sorted lists of nodes. Only the nodes within the radius of a
+    `bidirectional_search` are ever visited.
+    """
+    forward, backward, meet = bidirectional_search(graph, src, dst)
+
+    def heads(node: int) -> Iterator[List[int]]:
+        # shortest paths from `src` to `node`, reversed
+        if node == src:
+            yield [node]
+            return
+        for pred in graph.predecessors(node):
+            if forward.get(pred) == forward[node] - 1:
+                for head in heads(pred):
+                    yield [node] + head
+
+    def tails(node: int) -> Iterator[List[int]]:
+        if node == dst:
+            yield [node]
+            return
+        for succ in graph.successors(node):
+            if backward.get(succ) == backward[node] - 1:
+                for tail in tails(succ):
+                    yield [node] + tail
+
+    paths = []
+    for node in meet:
+        for head in heads(node):
+            for tail in tails(node):
+                if limit is not None and len(paths) >= limit:
+                    return sorted(paths)
+                paths.append(head[::-1] + tail[1:])
+    return sorted(paths)
+
+
+def shortest_path(graph: Graph, src: int, dst: int) -> List[int]:
+    """
+    Return a shortest path from `src` to `dst` as a list of nodes, or an empty list
+    if `dst` is not reachable.
+    """
+    forward, backward, meet = bidirectional_search(graph, src, dst)
+    if not meet:
+        return []
+    path = [meet[0]]
+    while path[-1] != src:
+        distance = forward[path[-1]] - 1
+        preds = graph.predecessors(path[-1])
+        path.append(next(p for p in preds if forward.get(p) == distance))
+    path.reverse()
+    while path[-1] != dst:
+        distance = backward[path[-1]] - 1
+        succs = graph.successors(path[-1])
+        path.append(next(s for s in succs if backward.get(s) == distance))
+    return path
+
+
+# the set bits of each byte value, for decoding bitsets a byte at a time
+BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+
+def bitset_members(bits: int) -> Iterator[int]:
+    """
+    Yield the indices of the set bits of `bits` in increasing order.
+    """
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+    for byte_idx, byte in enumerate(data):
+        if byte:
+            base = byte_idx * 8
+            for bit in BYTE_BITS[byte]:
+                yield base + bit
+
+
+class ReachabilityIndex:
+    """
+    Answers "which nodes can be reached from these nodes" without a graph search.
+
+    The graph is condensed into its strongly connected components, which form a DAG.
+    For each component we store, as a Python int used as a bitset over component
+    ids, the components reachable from it by a path of at least one edge. These are
+    computed in a single pass in reverse topological order, OR-ing together the
+    bitsets of the successor components. A query is then the union of a few ints.
+
+    With `reverse` set, reachability follows edges backwards, ie. it answers "which
+    nodes reach these nodes".
+    """
+
+    @timed_phase("graph.reachability_index")
+    def __init__(self, graph: Graph, reverse: bool = False):
+        self.graph = graph
+        self.components = strongly_connected_components(graph)
+        self.component_of = array("i", [0]) * len(graph)
+        for idx, scc in enumerate(self.components):
+            for node in scc:
+                self.component_of[node] = idx
+        # components are in reverse topological order, so the components reachable
+        # forwards from a component are always found earlier in the list
+        order = range(len(self.components))
+        neighbours = graph.successors
+        if reverse:
+            order = order[::-1]
+            neighbours = graph.predecessors
+        component_of = self.component_of
+        self.reach: List[int] = [0] * len(self.components)
+        for idx in order:
+            scc = self.components[idx]
+            targets = set()
+            for node in scc:
+                targets.update(component_of[other] for other in neighbours(node))
+            bits = 0
+            for target in targets:
+                if target == idx:
+                    continue
+                bits |= self.reach[target] | (1 << target)
+            if is_cyclic_component(graph, scc):
+                bits |= 1 << idx
+            self.reach[idx] = bits
+
+    def reachable(self, nodes: Iterable[int]) -> List[int]:
+        """
+        Return the sorted nodes reachable from any of `nodes` by a path of at least
+        one edge. A node is only part of the result if it's on a cycle or reachable
+        from another of `nodes`.
+        """
+        bits = 0
+        for node in nodes:
+            bits |= self.reach[self.component_of[node]]
+        result = []
+        for idx in bitset_members(bits):
+            result.extend(self.components[idx])
+        result.sort()
+        return result
+
+
+def reachable(graph: Graph, nodes: Iterable[int], reverse: bool = False) -> List[int]:
+    """
+    Return `ReachabilityIndex(graph, reverse).reachable(nodes)`, for a single query.
+    """
+    sparse = sparse_backend(graph.edge_count())
+    if sparse is not None:
+        return sparse.reachable(graph, nodes, reverse)
+    return ReachabilityIndex(graph, reverse=reverse).reachable(nodes)
+
+
+def elementary_cycles(
+    graph: Graph, max_length: Optional[int] = None
+) -> Iterator[List[int]]:
+    """
+    Generate the elementary cycles of the graph with Johnson's algorithm, streaming
+    each cycle as soon as it's found.
+
+    Each strongly connected component is searched for cycles through its smallest
+    node, which is then removed before the rest of the component is split into
+    components again. So every cycle is generated exactly once, starting with its
+    smallest node, ie. in the form returned by `canonicalize_cycle`.
+
+    If `max_length` is given, only cycles with at most that many nodes are
+    generated. Johnson's blocking does not hold for length-bounded searches, so
+    those use a depth-first search pruned by the distance back to the start node.
+    """
+    # components are disjoint, so keyed by their smallest node
+    components = [
+        (scc[0], scc)
+        for scc in strongly_connected_components(graph)
+        if is_cyclic_component(graph, scc)
+    ]
+    heapq.heapify(components)
+    mask = bytearray(len(graph))
+    while components:
+        _, scc = heapq.heappop(components)
+        for node in scc:
+            mask[node] = 1
+        start = scc[0]
+        if max_length is None:
+            yield from _johnson_circuits(graph, mask, start)
+        else:
+            yield from _bounded_circuits(graph, mask, start, max_length)
+        for node in scc:
+            mask[node] = 0
+        for sub_scc in strongly_connected_components(graph, scc[1:]):
+            if is_cyclic_component(graph, sub_scc):
+                heapq.heappush(components, (sub_scc[0], sub_scc))
+
+
+def _johnson_circuits(graph: Graph, mask: bytearray, start: int) -> Iterator[List[int]]:
+    def successors(node: int) -> List[int]:
+        return [dst for dst in graph.successors(node) if mask[dst]]
+
+    path = [start]
+    blocked = {start}
+    blocked_by: Dict[int, Set[int]] = {}
+    stack = [iter(successors(start))]
+    closed = [False]
+    while stack:
+        for node in stack[-1]:
+            if node == start:
+                yield path[:]
+                closed[-1] = True
+            elif node not in blocked:
+                path.append(node)
+                closed.append(False)
+                stack.append(iter(successors(node)))
+                blocked.add(node)
+                break
+        else:
+            stack.pop()
+            node = path.pop()
+            if closed.pop():
+                if closed:
+                    closed[-1] = True
+                to_unblock = [node]
+                while to_unblock:
+                    unblock = to_unblock.pop()
+                    if unblock in blocked:
+                        blocked.remove(unblock)
+                        to_unblock.extend(blocked_by.pop(unblock, ()))
+            else:
+                for dst in successors(node):
+                    blocked_by.setdefault(dst, set()).add(node)
+
+
+def _bounded_circuits(
+    graph: Graph, mask: bytearray, start: int, max_length: int
+) -> Iterator[List[int]]:
+    distance: Dict[int, int] = {start: 0}
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for dst in frontier:
+            for src in graph.predecessors(dst):
+                if mask[src] and src not in distance:
+                    distance[src] = distance[dst] + 1
+                    next_frontier.append(src)
+        frontier = next_frontier
+
+    path = [start]
+    on_path = {start}
+    stack = [iter(graph.successors(start))]
+    while stack:
+        for node in stack[-1]:
+            if node == start:
+                yield path[:]
+            elif (
+                mask[node]
+                and node not in on_path
+                and len(path) + distance.get(node, max_length) <= max_length
+            ):
+                path.append(node)
+                on_path.add(node)
+                stack.append(iter(graph.successors(node)))
+                break
+        else:
+            stack.pop()
+            on_path.discard(path.pop())
+
+
+def eades_lin_smyth_order(graph: Graph, nodes: List[int]) -> List[int]:
+    """
+    Return a linear ordering of `nodes` that has few backward edges in the subgraph
+    they induce, using the greedy heuristic of Eades, Lin and Smyth.
+
+    Sinks are repeatedly moved to the end of the ordering and sources to the start;
+    when neither is left, the node with the largest out-degree minus in-degree is
+    moved to the start. Ties are broken by node id. This runs in O(E log V).
+    """
+    nodes = sorted(nodes)
+    remaining = set(nodes)
+    out_degree = {
+        node: sum(1 for dst in graph.successors(node) if dst in remaining)
+        for node in nodes
+    }
+    in_degree = {
+        node: sum(1 for src in graph.predecessors(node) if src in remaining)
+        for node in nodes
+    }
+    sinks: List[int] = []
+    sources: List[int] = []
+    heap: List[Tuple[int, int]] = []
+
+    def classify(node: int) -> None:
+        if out_degree[node] == 0:
+            sinks.append(node)
+        elif in_degree[node] == 0:
+            sources.append(node)
+        else:
+            heapq.heappush(heap, (in_degree[node] - out_degree[node], node))
+
+    def remove(node: int) -> None:
+        remaining.remove(node)
+        for dst in graph.successors(node):
+            if dst in remaining:
+                in_degree[dst] -= 1
+                classify(dst)
+        for src in graph.predecessors(node):
+            if src in remaining:
+                out_degree[src] -= 1
+                classify(src)
+
+    for node in reversed(nodes):
+        classify(node)
+
+    head: List[int] = []
+    tail: List[int] = []
+    while remaining:
+        while sinks:
+            node = sinks.pop()
+            if node in remaining:
+                remove(node)
+                tail.append(node)
+        while sources:
+            node = sources.pop()
+            if node in remaining:
+                remove(node)
+                head.append(node)
+        while heap:
+            neg_delta, node = heapq.heappop(heap)
+            if (
+                node in remaining
+                and out_degree[node] > 0
+                and in_degree[node] > 0
+                and neg_delta == in_degree[node] - out_degree[node]
+            ):
+                remove(node)
+                head.append(node)
+                break
+    return head + tail[::-1]
+
+
+def sift_order(graph: Graph, order: List[int], max_passes: int = 4) -> List[int]:
+    """
+    Improve a linear ordering of nodes by local search: each node in turn is moved
+    to the position that minimises the number of backward edges incident to it.
+    Only edges between nodes of `order` are considered.
+
+    The best position of a node only depends on the positions of its neighbours, so
+    each move costs O(d log d) for a node of degree d.
+    """
+    position: Dict[int, float] = {node: float(idx) for idx, node in enumerate(order)}
+    for _ in range(max_passes):
+        improved = False
+        for node in order:
+            # (position, cost change when moving the node past it)
+            steps: List[Tuple[float, int]] = []
+            cost = 0
+            for dst in graph.successors(node):
+                if dst != node and dst in position:
+                    steps.append((position[dst], 1))
+            for src in graph.predecessors(node):
+                if src != node and src in position:
+                    steps.append((position[src], -1))
+                    cost += 1
+            steps.sort()
+            current = position[node]
+            current_cost = cost + sum(delta for pos, delta in steps if pos < current)
+            best_cost, best_gap = cost, 0
+            for idx, (pos, delta) in enumerate(steps):
+                cost += delta
+                if cost < best_cost and (
+                    idx + 1 == len(steps) or steps[idx + 1][0] > pos
+                ):
+                    best_cost, best_gap = cost, idx + 1
+            if best_cost >= current_cost:
+                continue
+            low = steps[best_gap - 1][0] if best_gap > 0 else steps[0][0] - 1.0
+            high = steps[best_gap][0] if best_gap < len(steps) else steps[-1][0] + 1.0
+            new_position = (low + high) / 2
+            if low < new_position < high:
+                position[node] = new_position
+                improved = True
+        order = sorted(order, key=position.__getitem__)
+        position = {node: float(idx) for idx, node in enumerate(order)}
+        if not improved:
+            break
+    return order
+
+
+@timed_phase("graph.feedback_arc_set")
+def feedback_arc_set(graph: Graph, refine: bool = False) -> List[Tuple[int, int]]:
+    """
+    Return a small set of edges whose removal makes the graph acyclic.
+
+    Every edge in a cycle lies within a strongly connected component, so each cyclic
+    component is ordered separately with `eades_lin_smyth_order` (and `sift_order`
+    if `refine` is set), and the edges pointing backwards in that order are cut.
+    """
+    cut: List[Tuple[int, int]] = []
+    for scc in strongly_connected_components(graph, canonical=True):
+        if not is_cyclic_component(graph, scc):
+            continue
+        order = eades_lin_smyth_order(graph, scc)
+        if refine:
+            order = sift_order(graph, order)
+        position = {node: idx for idx, node in enumerate(order)}
+        for src in scc:
+            for dst in graph.successors(src):
+                if dst in position and position[dst] <= position[src]:
+                    cut.append((src, dst))
+    return sorted(cut)
+
+
+def package_cycle_paths(
+    graph: Graph,
+    packages: List[Optional[str]],
+    excluded: List[bool],
+    ignore_cycles_in: Iterable[str] = (),
+) -> Iterator[List[int]]:
+    """
+    Generate the paths reported by `print_cycles_legacy`: for each root node (a node
+    with outgoing edges) in a package not in `ignore_cycles_in`, a depth-first
+    search visits each node at most once and reports every path that leaves the
+    root's package and comes back into it. Nodes without a package end a path, and
+    excluded nodes are skipped.
+
+    Which paths are reported depends on the order nodes are visited in, so the search
+    itself is kept. But for each package we first work out, once, which nodes can
+    still lead back into it, and subtrees that can't are never expanded. Roots that
+    can't leave their package and come back are skipped outright.
+    """
+    ignore = set(ignore_cycles_in)
+    n = len(graph)
+    valid = [not excluded[node] and packages[node] is not None for node in range(n)]
+    returners: Dict[str, Tuple[bytearray, bytearray]] = {}
+
+    def returners_for(package: str) -> Tuple[bytearray, bytearray]:
+        # `can_return[v]`: v is outside `package` and reaches it through nodes
+        # outside `package`. `can_escape[v]`: v is in `package` and reaches a node of
+        # `can_return` through nodes inside `package`.
+        if package in returners:
+            return returners[package]
+        can_return = bytearray(n)
+        frontier = [v for v in range(n) if valid[v] and packages[v] == package]
+        while frontier:
+            next_frontier = []
+            for dst in frontier:
+                for src in graph.predecessors(dst):
+                    if valid[src] and packages[src] != package and not can_return[src]:
+                        can_return[src] = 1
+                        next_frontier.append(src)
+            frontier = next_frontier
+        can_escape = bytearray(n)
+        frontier = []
+        for v in range(n):
+            if valid[v] and packages[v] == package:
+                if any(can_return[dst] for dst in graph.successors(v)):
+                    can_escape[v] = 1
+                    frontier.append(v)
+        while frontier:
+            next_frontier = []
+            for dst in frontier:
+                for src in graph.predecessors(dst):
+                    if valid[src] and packages[src] == package and not can_escape[src]:
+                        can_escape[src] = 1
+                        next_frontier.append(src)
+            frontier = next_frontier
+        returners[package] = (can_return, can_escape)
+        return can_return, can_escape
+
+    seen = [0] * n
+    for root in range(n):
+        top_level_package = packages[root]
+        if (
+            graph.out_degree(root) == 0
+            or top_level_package is None
+            or top_level_package in ignore
+            or excluded[root]
+        ):
+            continue
+        can_return, can_escape = returners_for(top_level_package)
+        if not can_escape[root]:
+            continue
+        stamp = root + 1
+        seen[root] = stamp
+        path = [root]
+        stack = [(iter(graph.successors(root)), False)]
+        while stack:
+            successors, left_top_level = stack[-1]
+            for node in successors:
+                if excluded[node] or seen[node] == stamp:
+                    continue
+                seen[node] = stamp
+                package = packages[node]
+                if package is None:
+                    continue
+                if package == top_level_package:
+                    if left_top_level:
+                        yield path + [node]
+                        continue
+                    if not can_escape[node]:
+                        # nothing to report below here, but the search would still
+                        # have marked every package node it can reach as seen
+                        flood = [node]
+                        while flood:
+                            for dst in graph.successors(flood.pop()):
+                                if (
+                                    packages[dst] == top_level_package
+                                    and not excluded[dst]
+                                    and seen[dst] != stamp
+                                ):
+                                    seen[dst] = stamp
+                                    flood.append(dst)
+                        continue
+                elif not can_return[node]:
+                    continue
+                path.append(node)
+                stack.append(
+                    (
+                        iter(graph.successors(node)),
+                        left_top_level or package != top_level_package,
+                    )
+                )
+                break
+            else:
+                stack.pop()
+                path.pop()
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+
+class LazyGroup(click.Group):
+    """
+    A click group whose subcommands are imported only when they are invoked, so that
+    `--help` and each command pay only for the modules they use.
+
+    `lazy_commands` maps each command name to the `module:attribute` defining it and
+    to the short help listed by `--help`.
+    """
+
+    def __init__(
+        self, *args, lazy_commands: Dict[str, Tuple[str, str]] = {}, **kwargs
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.lazy_commands = lazy_commands
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted([*super().list_commands(ctx), *self.lazy_commands])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        if cmd_name not in self.lazy_commands:
+            return super().get_command(ctx, cmd_name)
+        import_path, short_help = self.lazy_commands[cmd_name]
+        module_name, attribute = import_path.split(":")
+        # unlike `importlib.import_module`, this shows up in `python -X importtime`
+        module = __import__(module_name, fromlist=[attribute])
+        command = getattr(module, attribute)
+        command.short_help = short_help
+        return command
+
+    def format_commands(
+        self, ctx: click.Context, formatter: click.HelpFormatter
+    ) -> None:
+        # as `click.Group.format_commands`, without importing the lazy commands
+        cmd_names = self.list_commands(ctx)
+        limit = formatter.width - 6 - max((len(name) for name in cmd_names), default=0)
+        rows = []
+        for cmd_name in cmd_names:
+            if cmd_name in self.lazy_commands:
+                rows.append((cmd_name, self.lazy_commands[cmd_name][1]))
+                continue
+            command = super().get_command(ctx, cmd_name)
+            if command is not None and not command.hidden:
+                rows.append((cmd_name, command.get_short_help_str(limit)))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -1,51 +1,138 @@
 from __future__ import annotations
 
-from collections import Counter
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
 
 import json
+import time
 
 import click
-import yaml
-
-from .config import Config
-from .edge import Edge
-from .extract import extract
-from .graph import (
-    is_excluded,
-    generate_transitive_path_lookup,
-    edge_path_as_node_list,
-    edges_to_adjacency_list,
-    remap_edges,
-)
-
-
-def generate_forward_lookup_from_reverse(
-    rlookup: Dict[str, List[str]],
-) -> Dict[str, str]:
-    d = {}
-    for k, vs in rlookup.items():
-        for v in vs:
-            if v in d:
-                raise ValueError(f"key {v} already in dictionary")
-            d[v] = k
-    return d
 
-
-def generate_dot(config: Config) -> str:
-    parse_summary = config.build_parse_summary()
-    src_edges = {s for s, d in parse_summary.edges}
-    s = "digraph G {\n"
-    for src, dst in parse_summary.edges:
-        if dst in src_edges:
-            s += f'  "{src}" -> "{dst}";\n'
-    s += "}\n"
-    return s
+from .hooks import PhaseTimings, add_phase_hook, remove_phase_hook
+from .lazy_group import LazyGroup
+
+if TYPE_CHECKING:
+    from .cache import ParseCache
+
+
+# each command's module is only imported when the command is run
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "print_leafs": (
+        "uncycle.commands.graphs:print_leafs",
+        "Print dependencies that have no further dependencies",
+    ),
+    "print_layers": (
+        "uncycle.commands.graphs:print_layers",
+        "Output the topological layers of files or packages as JSON",
+    ),
+    "print_edges": (
+        "uncycle.commands.graphs:print_edges",
+        "print edge info",
+    ),
+    "print_missing_annotations": (
+        "uncycle.commands.graphs:print_missing_annotations",
+        "Search a directory for python files without package annotations",
+    ),
+    "print_dependency_graph": (
+        "uncycle.commands.graphs:print_dependency_graph",
+        "Output a dependency graph of all the files in a directory",
+    ),
+    "print_virtual_dependency_graph": (
+        "uncycle.commands.graphs:print_virtual_dependency_graph",
+        "Output a dependency graph of all the packages in a directory",
+    ),
+    "dump_inline_packages": (
+        "uncycle.commands.graphs:dump_inline_packages",
+        "Dump inline package annotations ready for use with .yaml files",
+    ),
+    "print_cycles": (
+        "uncycle.commands.cycles:print_cycles",
+        "Output cycles found in the dependency graph",
+    ),
+    "print_cut_set": (
+        "uncycle.commands.cycles:print_cut_set",
+        "Output a small set of edges whose removal breaks all cycles",
+    ),
+    "print_cycles_legacy": (
+        "uncycle.commands.cycles:print_cycles_legacy",
+        "(Legacy) output cycles found in the virtual dependency graph",
+    ),
+    "print_path": (
+        "uncycle.commands.paths:print_path",
+        "Output the shortest import chain from one file to another",
+    ),
+    "print_impacted": (
+        "uncycle.commands.paths:print_impacted",
+        "Output every file that transitively imports any of the given files",
+    ),
+    "print_dependencies": (
+        "uncycle.commands.paths:print_dependencies",
+        "Output every file transitively imported by any of the given files",
+    ),
+    "export_graph": (
+        "uncycle.commands.export:export_graph",
+        "Export the file or package graph as DOT, GraphML or JSON",
+    ),
+    "extract": (
+        "uncycle.commands.extract:do_extract",
+        "Interactive interface to extract a new package",
+    ),
+    "watch": (
+        "uncycle.commands.watch:watch",
+        "Re-run a command whenever python files change",
+    ),
+    "serve": (
+        "uncycle.commands.serve:serve",
+        "Answer JSON queries from a graph kept in memory",
+    ),
+    "snapshot": (
+        "uncycle.commands.snapshot:snapshot",
+        "Save the dependency graph to a binary snapshot file",
+    ),
+    "diff": (
+        "uncycle.commands.snapshot:diff",
+        "Compare a saved snapshot with the current graph or another snapshot",
+    ),
+}
+
+
+def start_timings(ctx: click.Context, text: bool, json_path: Optional[Path]) -> None:
+    """
+    Collect phase timings until the command finishes, then report them.
+    """
+    phase_timings = PhaseTimings()
+    add_phase_hook(phase_timings)
+    start = time.perf_counter()
+
+    def report() -> None:
+        remove_phase_hook(phase_timings)
+        phase_timings("total", time.perf_counter() - start, 1, {})
+        if text:
+            click.echo(phase_timings.format(), err=True)
+        if json_path is not None:
+            json_path.write_text(json.dumps(phase_timings.to_json(), indent=4) + "\n")
+
+    ctx.call_on_close(report)
+
+
+def start_profile(ctx: click.Context, profile_path: Path) -> None:
+    import cProfile
+
+    profiler = cProfile.Profile()
+
+    def stop() -> None:
+        profiler.disable()
+        profiler.dump_stats(profile_path)
+        click.echo(f"profile written to {profile_path}", err=True)
+
+    ctx.call_on_close(stop)
+    profiler.enable()
 
 
 @click.group(
-    help="A utility for grouping different parts of the repo into separate projects"
+    cls=LazyGroup,
+    lazy_commands=COMMANDS,
+    help="A utility for grouping different parts of the repo into separate projects",
 )
 @click.option(
     "--directory",
@@ -74,6 +161,56 @@ def generate_dot(config: Config) -> str:
     default=None,
     help="Path to the YAML configuration file.",
 )
+@click.option(
+    "--cache",
+    "cache_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    required=False,
+    default=None,
+    help="Path to a persistent parse cache. Only changed files are re-parsed.",
+)
+@click.option(
+    "--clear-cache",
+    is_flag=True,
+    help="Invalidate the parse cache before use",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    default=1,
+    help="Number of processes used to parse files (0 for one per CPU)",
+)
+@click.option(
+    "--prefetch",
+    type=int,
+    default=0,
+    help="With one job, read this many files ahead of the parser (for slow disks)",
+)
+@click.option(
+    "--backend",
+    type=click.Choice(["auto", "python", "scipy"]),
+    default="auto",
+    help="Graph backend; scipy is vectorised, auto uses it on large graphs if installed",
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Report the time spent in each phase to stderr",
+)
+@click.option(
+    "--timings-json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the time spent in each phase to this file as JSON",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Profile the command with cProfile and write the stats to this file",
+)
 @click.pass_context
 def cli(
     ctx: click.Context,
@@ -81,11 +218,22 @@ def cli(
     excluded_paths: List[Path],
     top_level_only: bool,
     config_path: Optional[Path],
+    cache_path: Optional[Path],
+    clear_cache: bool,
+    jobs: int,
+    prefetch: int,
+    backend: str,
+    timings: bool,
+    timings_json: Optional[Path],
+    profile_path: Optional[Path],
 ) -> None:
     config_ignore_cycles_in: List[str] = []
     package_contents: Dict[str, List[str]] = {}
     config_excluded_paths: List[Path] = []
     if config_path is not None:
+        # only load the YAML parser when it's needed
+        import yaml
+
         # Reading from the YAML configuration file
         config_data = yaml.safe_load(config_path.read_text())
 
@@ -94,6 +242,32 @@ def cli(
         config_ignore_cycles_in = config_data.get("ignore_cycles_in", [])
         package_contents = config_data.get("package_contents", {})
 
+    from .backend import set_backend
+
+    try:
+        set_backend(backend)
+    except ImportError:
+        raise click.UsageError("the scipy backend needs numpy and scipy installed")
+
+    if timings or timings_json is not None:
+        start_timings(ctx, timings, timings_json)
+    if profile_path is not None:
+        start_profile(ctx, profile_path)
+
+    from .config import Config
+
+    cache: Optional[ParseCache] = None
+    if clear_cache and cache_path is None:
+        raise click.UsageError("--clear-cache needs --cache")
+    if cache_path is not None:
+        from .cache import ParseCache
+
+        parse_cache = ParseCache(
+            cache_path, include_dir, top_level_only, clear=clear_cache
+        )
+        ctx.call_on_close(lambda: click.echo(parse_cache.summary(), err=True))
+        cache = parse_cache
+
     # Instantiating the Config object
     config = Config(
         dir_path=Path(include_dir),
@@ -101,285 +275,13 @@ def cli(
         ignore_cycles_in=config_ignore_cycles_in,
         top_level_only=top_level_only,
         package_contents=package_contents,
+        cache=cache,
+        jobs=jobs,
+        prefetch=prefetch,
     )
 
     ctx.obj = config
 
 
-@cli.command(
-    "print_leafs",
-    short_help="Print dependencies that have no further dependencies",
-)
-@click.option("--ignore-dep", multiple=True, type=str, help="Ignore a dependency")
-@click.pass_context
-def print_leafs(ctx: click.Context, ignore_dep: List[str]) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
-    reduced_edges, reverse_lookup = remap_edges(
-        parse_summary.edges, rev_mod_map, drop_missing=False
-    )
-
-    adj_list = edges_to_adjacency_list(reduced_edges)
-    deps_to_ignore = set(ignore_dep)
-    leaf_set = set()
-    for ks in adj_list.values():
-        for k in ks:
-            imports = adj_list.get(k, [])
-            import_set = set(imports)
-            if not import_set.difference(deps_to_ignore):
-                leaf_set.add(k)
-    leafs = sorted(str(_) for _ in leaf_set)
-    print(json.dumps(leafs, indent=4))
-
-
-@cli.command(
-    "print_edges",
-    short_help="print edge info",
-)
-@click.pass_context
-def print_edges(ctx: click.Context) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    for edge in parse_summary.edges:
-        print(edge)
-
-
-@cli.command(
-    "print_missing_annotations",
-    short_help="Search a directory for python files without package annotations",
-)
-@click.pass_context
-def print_missing_annotations(ctx: click.Context) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    missing_annotations = []
-    for path in parse_summary.nodes:
-        md = parse_summary.node_to_metadata.get(path)
-        if md is None or md.inline_package is None:
-            missing_annotations.append(path)
-    print("\n".join(missing_annotations))
-
-
-@cli.command(
-    "print_dependency_graph",
-    short_help="Output a dependency graph of all the files in a directory",
-)
-@click.pass_context
-def print_dependency_graph(ctx: click.Context) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    dep_graph = edges_to_adjacency_list(parse_summary.edges)
-    print(json.dumps(dep_graph, indent=4))
-
-
-@cli.command(
-    "print_virtual_dependency_graph",
-    short_help="Output a dependency graph of all the packages in a directory",
-)
-@click.pass_context
-def print_virtual_dependency_graph(ctx: click.Context) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    path_to_package = parse_summary.path_to_package()
-    reduced_edges, reverse_lookup = remap_edges(parse_summary.edges, path_to_package)
-    adj_list = edges_to_adjacency_list(reduced_edges)
-    print(json.dumps(adj_list, indent=4))
-
-
-def edges_for_cycle(cycle: List[str]) -> List[Tuple[str, str]]:
-    edges: List[Tuple[str, str]] = []
-    for idx in range(len(cycle) - 1):
-        src = cycle[idx]
-        dst = cycle[idx + 1]
-        edges.append((src, dst))
-    edges.append((cycle[-1], cycle[0]))
-    return edges
-
-
-def canonicalize_cycle(cycle: List[str]) -> List[str]:
-    idx = min(range(len(cycle)), key=lambda x: cycle[x])
-    return cycle[idx:] + cycle[:idx]
-
-
-@cli.command(
-    "dump_inline_packages",
-    short_help="Dump inline package annotations ready for use with .yaml files",
-)
-@click.pass_context
-def dump_inline_packages(ctx: click.Context) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    path_to_package: dict[str, str] = parse_summary.path_to_package()
-    inline_summary: dict[str, list[str]] = {}
-    for path, package in path_to_package.items():
-        if package is None:
-            continue
-        if package not in inline_summary:
-            inline_summary[package] = []
-        inline_summary[package].append(path)
-    print(json.dumps(inline_summary, indent=4))
-
-
-@cli.command("print_cycles", short_help="Output cycles found in the dependency graph")
-@click.option(
-    "-w",
-    "--worst-edge-count",
-    type=int,
-    default=5,
-    help="Number of `worst edges` to print",
-)
-@click.option(
-    "-p",
-    "--print-reps",
-    is_flag=True,
-    help="Print file-level edges represented by package-level edges",
-)
-@click.pass_context
-def print_cycles(ctx: click.Context, worst_edge_count: int, print_reps: bool) -> None:
-    config = ctx.obj
-    parse_summary = config.build_parse_summary()
-    rev_mod_map = generate_forward_lookup_from_reverse(config.package_contents)
-    edges, reverse_lookup = remap_edges(
-        parse_summary.edges, rev_mod_map, drop_missing=False
-    )
-    path_lookup = generate_transitive_path_lookup(edges)
-    cycle_paths: set[tuple[str, ...]] = set()
-    for src, path_dict in path_lookup.items():
-        if src in path_dict:
-            cycle: List[str] = edge_path_as_node_list(path_dict[src][0])
-            cycle = canonicalize_cycle(cycle)
-            cycle_paths.add(tuple(cycle))
-    counter: Counter[tuple[str, str]] = Counter()
-    for cycle_tuple in cycle_paths:
-        cycle = list(cycle_tuple)
-        counter.update(edges_for_cycle(cycle))
-
-    cycle_paths_list = sorted(cycle_paths, key=lambda x: (len(x), x))
-    for cycle_path in cycle_paths_list:
-        print(f"cycle of length {len(cycle_path)} found: {list(cycle_path)}")
-    print(f"cycle count: {len(cycle_paths)}")
-    if worst_edge_count > 0:
-        print("worst edges:")
-        for edge, count in sorted(
-            counter.most_common(worst_edge_count), key=lambda x: (-x[1], x[0])
-        ):
-            print(f"{count:3d} {edge}")
-    reps: dict[Edge, list[Edge]] = {}
-    for edge in counter.keys():
-        if edge in reverse_lookup:
-            reps[edge] = reverse_lookup[edge]
-    if print_reps:
-        print("edge representatives:")
-        for edge, rep in sorted(reps.items()):
-            if len(rep) == 1 and rep[0] == edge:
-                continue
-            print(f" {edge}:")
-            for r in rep:
-                print(f"   {r}")
-
-
-@cli.command(
-    "print_cycles_legacy",
-    short_help="(Legacy) output cycles found in the virtual dependency graph",
-)
-@click.option(
-    "--ignore-cycles-in",
-    "ignore_cycles_in",
-    multiple=True,
-    type=str,
-    help="Ignore dependency cycles in a package",
-)
-@click.pass_context
-def print_cycles_legacy(ctx: click.Context, ignore_cycles_in: List[str]) -> None:
-    config = ctx.obj
-    excluded_paths = config.excluded_paths
-    ignore_cycles_in = config.ignore_cycles_in
-    parse_summary = config.build_parse_summary()
-    str_graph: Dict[str, List[str]] = edges_to_adjacency_list(parse_summary.edges)
-    graph: Dict[Path, List[Path]] = {
-        Path(k): [Path(v) for v in vs] for k, vs in str_graph.items()
-    }
-
-    path_to_package: Dict[Path, str] = config.package_map_path(
-        parse_summary.node_to_metadata
-    )
-
-    # Define a nested function for recursive dependency searching.
-    # top_level_package: The name of the package at the top of the dependency tree.
-    # left_top_level: A boolean flag indicating whether we have moved beyond the top-level package in our traversal.
-    # dependency: The current dependency path being examined.
-    # already_seen: A list of dependency paths that have already been visited to avoid infinite loops.
-    def recursive_dependency_search(
-        top_level_package: str,
-        left_top_level: bool,
-        dependency: Path,
-        already_seen: List[Path],
-    ) -> List[List[Tuple[str, Path]]]:
-        # Check if the dependency is in the list of already seen dependencies or is excluded.
-        if dependency in already_seen or is_excluded(dependency, excluded_paths):
-            return []
-
-        # Mark this dependency as seen.
-        already_seen.append(dependency)
-        # Parse the dependency file to obtain its annotations.
-        package: Optional[str] = path_to_package.get(dependency, None)
-
-        # If there are no annotations, return an empty list as there's nothing to process.
-        if package is None:
-            return []
-        # If the current dependency package matches the top-level package and we've left the top-level,
-        # return a list containing this dependency.
-        elif package == top_level_package and left_top_level:
-            return [[(package, dependency)]]
-        else:
-            # Update the left_top_level flag if we have moved to a different package.
-            left_top_level = left_top_level or package != top_level_package
-            # Recursively search through all dependencies of the current dependency and accumulate the results.
-            return [
-                [(package, dependency), *stack]
-                for stack in [
-                    _stack
-                    for dep in graph.get(dependency, [])
-                    for _stack in recursive_dependency_search(
-                        top_level_package, left_top_level, dep, already_seen
-                    )
-                ]
-            ]
-
-    # Initialize an accumulator for paths that are part of cycles.
-    path_accumulator = []
-    # Iterate over each package (parent) in the graph.
-    for parent in graph:
-        # Parse the parent package file.
-        package: Optional[str] = path_to_package.get(parent, None)
-        # Skip this package if it has no annotations or should be ignored in cycle detection.
-        if package is None or package in ignore_cycles_in:
-            continue
-        # Extend the path_accumulator with results from the recursive search starting from this parent.
-        path_accumulator.extend(recursive_dependency_search(package, False, parent, []))
-
-    # Format and return the accumulated paths as strings showing the cycles.
-    r = [
-        " -> ".join([str(d) + f" ({p})" for p, d in stack])
-        for stack in path_accumulator
-    ]
-    print("\n".join(r))
-
-
-@cli.command(
-    "extract",
-    short_help="Interactive interface to extract a new package",
-)
-@click.argument("new_package_name", type=str)
-@click.option(
-    "--top", type=bool, is_flag=True, help="Peel nodes from tree top instead of bottom"
-)
-@click.pass_context
-def do_extract(ctx: click.Context, new_package_name: str, top: bool) -> None:
-    config = ctx.obj
-    extract(config, new_package_name, top)
-
-
 if __name__ == "__main__":
     cli()
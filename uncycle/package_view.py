@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+from .edge import Edge
+from .graph import Graph
+from .parse_summary import ParseSummary
+
+
+class PackageView:
+    """
+    The package-level condensation of a file graph: each file is mapped to
+    `path_to_package[file]`, or, if missing, to itself or, with `drop_missing`,
+    dropped, as in `Graph.quotient`.
+
+    The number of file edges behind each package edge is kept, so `assign` moving a
+    file to another package only updates the edges incident to that file, and
+    `patch` applying a diff of the file graph only the edges in the diff. The
+    quotient, and anything `memo` derived from it, is kept until a package or a
+    package edge appears or disappears.
+    """
+
+    def __init__(
+        self,
+        graph: Graph,
+        path_to_package: Dict[str, str],
+        drop_missing: bool = False,
+    ):
+        self.path_to_package = path_to_package
+        self.drop_missing = drop_missing
+        # file -> package, for files moved by `assign`
+        self.assigned: Dict[str, Optional[str]] = {}
+        # package -> number of its files
+        self.sizes: Dict[str, int] = {}
+        # package edge -> number of file edges it stands for
+        self.edge_counts: Dict[Edge, int] = {}
+        self._graph: Optional[Graph] = graph
+        self._build_graph: Optional[Callable[[], Graph]] = None
+        self._packages: List[Optional[str]] = []
+        # package -> ids of its files
+        self._members: Dict[str, Set[int]] = {}
+        self._quotient: Optional[Graph] = None
+        self._memo: Dict[Hashable, Any] = {}
+        self._index(graph)
+        for package, members in self._members.items():
+            self.sizes[package] = len(members)
+        packages = self._packages
+        edge_counts = self.edge_counts
+        for src in range(len(graph)):
+            src_package = packages[src]
+            if src_package is None:
+                continue
+            for dst in graph.successors(src):
+                dst_package = packages[dst]
+                if dst_package is not None and dst_package != src_package:
+                    edge = (src_package, dst_package)
+                    edge_counts[edge] = edge_counts.get(edge, 0) + 1
+
+    @classmethod
+    def from_summary(
+        cls,
+        summary: ParseSummary,
+        path_to_package: Dict[str, str],
+        drop_missing: bool = False,
+    ) -> PackageView:
+        graph = Graph.from_edges(summary.edges, summary.nodes)
+        return cls(graph, path_to_package, drop_missing)
+
+    @property
+    def graph(self) -> Graph:
+        """
+        The file graph. After a `patch` it's only rebuilt here, on first use.
+        """
+        if self._graph is None:
+            assert self._build_graph is not None
+            self._graph = self._build_graph()
+            self._build_graph = None
+            self._index(self._graph)
+        return self._graph
+
+    def _index(self, graph: Graph) -> None:
+        package = self.package
+        self._packages = [package(name) for name in graph.names]
+        self._members = {}
+        for node, node_package in enumerate(self._packages):
+            if node_package is not None:
+                self._members.setdefault(node_package, set()).add(node)
+
+    def package(self, name: str) -> Optional[str]:
+        if name in self.assigned:
+            return self.assigned[name]
+        package = self.path_to_package.get(name)
+        if package is None and not self.drop_missing:
+            package = name
+        return package
+
+    def _invalidate(self) -> None:
+        self._quotient = None
+        self._memo.clear()
+
+    def _resize(self, package: Optional[str], delta: int) -> None:
+        if package is None:
+            return
+        prior = self.sizes.get(package, 0)
+        size = prior + delta
+        if size:
+            self.sizes[package] = size
+        else:
+            del self.sizes[package]
+        if not prior or not size:
+            self._invalidate()
+
+    def _update_edge(
+        self, src_package: Optional[str], dst_package: Optional[str], delta: int
+    ) -> None:
+        if src_package is None or dst_package is None or src_package == dst_package:
+            return
+        edge = (src_package, dst_package)
+        prior = self.edge_counts.get(edge, 0)
+        count = prior + delta
+        if count:
+            self.edge_counts[edge] = count
+        else:
+            del self.edge_counts[edge]
+        if not prior or not count:
+            self._invalidate()
+
+    def _update_incident_edges(self, node: int, delta: int) -> None:
+        graph = self.graph
+        packages = self._packages
+        package = packages[node]
+        for dst in graph.successors(node):
+            self._update_edge(package, packages[dst], delta)
+        for src in graph.predecessors(node):
+            if src != node:
+                self._update_edge(packages[src], package, delta)
+
+    def assign(self, name: str, package: Optional[str]) -> None:
+        """
+        Move the file `name` to `package`, or drop it if `package` is `None`. This
+        costs O(degree of `name`).
+        """
+        node = self.graph.ids[name]
+        old_package = self._packages[node]
+        if old_package == package:
+            return
+        self._update_incident_edges(node, -1)
+        if old_package is not None:
+            self._members[old_package].discard(node)
+            if not self._members[old_package]:
+                del self._members[old_package]
+        self._resize(old_package, -1)
+        self.assigned[name] = package
+        self._packages[node] = package
+        if package is not None:
+            self._members.setdefault(package, set()).add(node)
+        self._resize(package, 1)
+        self._update_incident_edges(node, 1)
+
+    def patch(
+        self,
+        node_changes: Dict[str, int],
+        edge_changes: Dict[Edge, int],
+        build_graph: Callable[[], Graph],
+    ) -> None:
+        """
+        Apply a diff of the file graph, mapping each added file or file edge to 1 and
+        each removed one to -1. This costs O(size of the diff); `build_graph` returns
+        the patched file graph, and is only called once `graph` is needed.
+        """
+        for (src, dst), delta in edge_changes.items():
+            self._update_edge(self.package(src), self.package(dst), delta)
+        for name, delta in node_changes.items():
+            self._resize(self.package(name), delta)
+            if delta < 0:
+                self.assigned.pop(name, None)
+        self._graph = None
+        self._build_graph = build_graph
+
+    def memo(self, key: Hashable, f: Callable[[], Any]) -> Any:
+        """
+        Return `f()`, computed once per quotient: `f` should only depend on it.
+        """
+        if key not in self._memo:
+            self._memo[key] = f()
+        return self._memo[key]
+
+    def edges(self) -> List[Edge]:
+        """
+        The sorted package edges, as `remap_edges` would return them.
+        """
+        return sorted(self.edge_counts)
+
+    def quotient(self) -> Graph:
+        """
+        The package graph, as `Graph.quotient` would build it. It's cached until a
+        package or a package edge appears or disappears.
+        """
+        if self._quotient is None:
+            names = sorted(self.sizes)
+            ids = {name: idx for idx, name in enumerate(names)}
+            self._quotient = Graph(
+                names, [(ids[src], ids[dst]) for src, dst in self.edge_counts]
+            )
+        return self._quotient
+
+    def representatives(self, wanted: Set[Edge]) -> Dict[Edge, List[Edge]]:
+        """
+        Return the file edges behind each package edge in `wanted`, as
+        `edge_representatives` does, only visiting the files of their source
+        packages.
+        """
+        graph = self.graph
+        names = graph.names
+        packages = self._packages
+        by_src: Dict[str, Set[str]] = {}
+        for src_package, dst_package in wanted:
+            if (src_package, dst_package) in self.edge_counts:
+                by_src.setdefault(src_package, set()).add(dst_package)
+        reps: Dict[Edge, List[Edge]] = {}
+        for src_package, dst_packages in by_src.items():
+            for src in sorted(self._members[src_package]):
+                for dst in graph.successors(src):
+                    dst_package = packages[dst]
+                    if dst_package in dst_packages:
+                        reps.setdefault((src_package, dst_package), []).append(
+                            (names[src], names[dst])
+                        )
+        return reps
@@ -1,73 +1,616 @@
 from __future__ import annotations
 
+import bisect
+import functools
+import io
+import os
 import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterator, List
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
 
-from .edge import Edge
+from .cache import ParseCache, content_digest
+from .edge import Edge, EdgeList
 from .file_metadata import FileMetadata
 from .graph import remap_edges
+from .hooks import PHASE_HOOKS, phase, report_phase
 from .imports import mods_imported_for_python_file, path_to_mod
+from .walk import ExclusionMatcher, WALK_THREADS, walk_python_files
+
+
+PACKAGE_ANNOTATION_RE = re.compile(r"^# Package: (.+)$", re.MULTILINE)
+PACKAGE_ANNOTATION_BYTES_RE = re.compile(rb"^# Package: (.+)$", re.MULTILINE)
+
+PARALLEL_CHUNK_SIZE = 256
+
+# the resolved imports and metadata of a file
+FileSummary = Tuple[List[str], FileMetadata]
+
+# called with the nodes and the edges a refresh added (1) or removed (-1)
+GraphListener = Callable[[Dict[str, int], Dict[Edge, int]], None]
+
+
+def python_file_stats(
+    base_dir: Path, excluded_paths: List[Path], threads: int = WALK_THREADS
+) -> Iterator[Tuple[Path, os.stat_result]]:
+    """
+    Gathers non-empty Python files in the specified directory, along with their stat
+    results. `excluded_paths` are relative to `base_dir` and may contain globs.
+    """
+    matcher = ExclusionMatcher(excluded_paths, base_dir)
+    return walk_python_files(base_dir, matcher, threads)
 
 
 def python_files(base_dir: Path, excluded_paths: List[Path]) -> Iterator[Path]:
     """
     Gathers non-empty Python files in the specified directory.
     """
-    exclude = set(base_dir / p for p in excluded_paths)
-    for root, dirs, files in base_dir.walk(top_down=True):
-        dirs[:] = [d for d in dirs if root / d not in exclude]
-        for file in files:
-            path = root / file
-            if path.suffix != ".py":
-                continue
-            if path in exclude:
-                continue
-            if path.stat().st_size == 0:
-                continue
-            yield path
+    for path, st in python_file_stats(base_dir, excluded_paths):
+        yield path
 
 
 @dataclass(frozen=True)
 class ParseSummary:
     nodes: List[str]
-    edges: List[Edge]
+    # an `EdgeList` when built by `build_parse_summary`
+    edges: Sequence[Edge]
     node_to_metadata: Dict[str, FileMetadata]
 
     def path_to_package(self) -> Dict[str, str]:
         return {k: v.inline_package for k, v in self.node_to_metadata.items()}
 
 
+def decode_source(data: bytes) -> str:
+    """
+    Decode file contents exactly as `Path.read_text` would, including universal
+    newline translation.
+    """
+    return io.TextIOWrapper(io.BytesIO(data)).read()
+
+
+def summarize_source(
+    filestring: str, base_dir: Path, path: Path, top_level_only: bool
+) -> Tuple[List[str], FileMetadata]:
+    """
+    Return the resolved list of modules imported by a python source file along with
+    its metadata.
+    """
+    line_count = len(filestring.split("\n"))
+    imports = list(
+        mods_imported_for_python_file(filestring, base_dir, path, top_level_only)
+    )
+    inline_package = None
+    result = PACKAGE_ANNOTATION_RE.search(filestring)
+    if result:
+        inline_package = sys.intern(result.group(1).strip())
+    return imports, FileMetadata(line_count, inline_package)
+
+
+def summarize_bytes(
+    data: bytes, base_dir: Path, path: Path, top_level_only: bool
+) -> Tuple[List[str], FileMetadata]:
+    """
+    As `summarize_source(decode_source(data), ...)`. Plain ASCII files without
+    carriage returns, ie. nearly all of them, decode to the same text, so their lines
+    and package annotation are found in the bytes directly, and they are only decoded
+    and parsed if they contain an `import` token at all.
+    """
+    if not data.isascii() or b"\r" in data:
+        return summarize_source(decode_source(data), base_dir, path, top_level_only)
+    line_count = data.count(b"\n") + 1
+    imports: List[str] = []
+    if b"import" in data:
+        imports = list(
+            mods_imported_for_python_file(
+                data.decode("ascii"), base_dir, path, top_level_only
+            )
+        )
+    inline_package = None
+    result = PACKAGE_ANNOTATION_BYTES_RE.search(data)
+    if result:
+        inline_package = sys.intern(result.group(1).decode("ascii").strip())
+    return imports, FileMetadata(line_count, inline_package)
+
+
+def summarize_files_timed(
+    paths: List[Path], base_dir: Path, top_level_only: bool, want_digest: bool = True
+) -> Tuple[List[Tuple[List[str], FileMetadata, Optional[str]]], float, float]:
+    """
+    Summarize files, also returning the seconds spent reading and parsing them. Each
+    result holds the content digest used by the parse cache if `want_digest` is set,
+    or `None`.
+    """
+    results = []
+    read_seconds = 0.0
+    parse_seconds = 0.0
+    for path in paths:
+        start = time.perf_counter()
+        data = path.read_bytes()
+        read_done = time.perf_counter()
+        imports, metadata = summarize_bytes(data, base_dir, path, top_level_only)
+        digest = content_digest(data) if want_digest else None
+        results.append((imports, metadata, digest))
+        read_seconds += read_done - start
+        parse_seconds += time.perf_counter() - read_done
+    return results, read_seconds, parse_seconds
+
+
+def prefetch_contents(
+    paths: Iterable[Path], prefetch: int
+) -> Iterator[Tuple[Path, bytes]]:
+    """
+    Read files on a pool of `prefetch` threads and yield `(path, contents)` in the
+    order of `paths`. At most `prefetch` reads are in flight or waiting to be
+    consumed at any time, so memory stays bounded however slow the consumer is.
+    """
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending: Deque[Tuple[Path, Future[bytes]]] = deque()
+        for path in paths:
+            if len(pending) >= prefetch:
+                done_path, future = pending.popleft()
+                yield done_path, future.result()
+            pending.append((path, executor.submit(path.read_bytes)))
+        while pending:
+            done_path, future = pending.popleft()
+            yield done_path, future.result()
+
+
+def summarize_files_prefetch(
+    paths: List[Path],
+    base_dir: Path,
+    top_level_only: bool,
+    prefetch: int,
+    want_digest: bool = True,
+) -> Tuple[List[Tuple[List[str], FileMetadata, Optional[str]]], float, float]:
+    """
+    As `summarize_files_timed`, but parsing each file while the next `prefetch` are
+    read by `prefetch_contents`, which hides I/O latency on slow filesystems. The
+    read time is how long parsing waited on reads.
+    """
+    results = []
+    read_seconds = 0.0
+    parse_seconds = 0.0
+    start = time.perf_counter()
+    for path, data in prefetch_contents(paths, prefetch):
+        read_done = time.perf_counter()
+        imports, metadata = summarize_bytes(data, base_dir, path, top_level_only)
+        digest = content_digest(data) if want_digest else None
+        results.append((imports, metadata, digest))
+        read_seconds += read_done - start
+        start = time.perf_counter()
+        parse_seconds += start - read_done
+    return results, read_seconds, parse_seconds
+
+
+def summarize_files_parallel(
+    paths: List[Path],
+    base_dir: Path,
+    top_level_only: bool,
+    jobs: int,
+    prefetch: int = 0,
+    want_digest: bool = True,
+) -> List[Tuple[List[str], FileMetadata, Optional[str]]]:
+    """
+    Summarize files across a pool of `jobs` processes. Files are handed out in chunks
+    to keep IPC overhead low, and results are returned in the order of `paths`. With
+    `prefetch` > 0, each process reads that many files ahead of its parser.
+
+    Reports the `read` and `parse` phases; with several jobs, their times are summed
+    across the worker processes.
+    """
+    if jobs <= 0:
+        jobs = os.cpu_count() or 1
+    if jobs == 1 or len(paths) == 0:
+        if prefetch > 0:
+            results, read_seconds, parse_seconds = summarize_files_prefetch(
+                paths, base_dir, top_level_only, prefetch, want_digest
+            )
+        else:
+            results, read_seconds, parse_seconds = summarize_files_timed(
+                paths, base_dir, top_level_only, want_digest
+            )
+    else:
+        # importing this pulls in `multiprocessing`, which single process runs skip
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunk_size = max(1, min(PARALLEL_CHUNK_SIZE, -(-len(paths) // (jobs * 4))))
+        chunks = [paths[i : i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        if prefetch > 0:
+            worker = functools.partial(
+                summarize_files_prefetch,
+                base_dir=base_dir,
+                top_level_only=top_level_only,
+                prefetch=prefetch,
+                want_digest=want_digest,
+            )
+        else:
+            worker = functools.partial(
+                summarize_files_timed,
+                base_dir=base_dir,
+                top_level_only=top_level_only,
+                want_digest=want_digest,
+            )
+        results = []
+        read_seconds = 0.0
+        parse_seconds = 0.0
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+            for chunk_results, chunk_read, chunk_parse in executor.map(worker, chunks):
+                results.extend(chunk_results)
+                read_seconds += chunk_read
+                parse_seconds += chunk_parse
+    if PHASE_HOOKS:
+        report_phase("read", read_seconds, len(paths), files=len(paths))
+        report_phase("parse", parse_seconds, len(paths), files=len(paths))
+    return results
+
+
+def summarize_paths(
+    paths: List[Path],
+    base_dir: Path,
+    top_level_only: bool,
+    cache: Optional[ParseCache] = None,
+    jobs: int = 1,
+    stats: Optional[List[os.stat_result]] = None,
+    prefetch: int = 0,
+) -> List[Tuple[List[str], FileMetadata]]:
+    """
+    Return the resolved imports and metadata of each file in `paths`, taking them
+    from `cache` where possible and parsing the rest. `stats` are the stat results
+    of `paths` if already known.
+    """
+    path_strs = [str(path.relative_to(base_dir)) for path in paths]
+    summaries: List[Optional[Tuple[List[str], FileMetadata]]] = [None] * len(paths)
+    if cache is not None:
+        with phase("cache", files=len(paths)) as counts:
+            for idx, path in enumerate(paths):
+                st = stats[idx] if stats is not None else None
+                summaries[idx] = cache.get(path_strs[idx], path, st)
+            counts["hits"] = sum(summary is not None for summary in summaries)
+
+    todo = [idx for idx, summary in enumerate(summaries) if summary is None]
+    # the content digest is only needed to fill the cache
+    parsed = summarize_files_parallel(
+        [paths[idx] for idx in todo],
+        base_dir,
+        top_level_only,
+        jobs,
+        prefetch,
+        want_digest=cache is not None,
+    )
+    for idx, (imports, metadata, digest) in zip(todo, parsed):
+        summaries[idx] = (imports, metadata)
+        if cache is not None and digest is not None:
+            st = stats[idx] if stats is not None else paths[idx].stat()
+            cache.put(path_strs[idx], st, digest, imports, metadata)
+    return [summary for summary in summaries if summary is not None]
+
+
+def summarize_walk_prefetch(
+    path_stats: Iterable[Tuple[Path, os.stat_result]],
+    base_dir: Path,
+    top_level_only: bool,
+    cache: Optional[ParseCache],
+    prefetch: int,
+) -> Iterator[Tuple[Path, FileSummary]]:
+    """
+    As `summarize_paths` with a single job, but consuming the walk as it goes: each
+    file missing from `cache` is handed to `prefetch_contents` as soon as the walk
+    yields it, so the walk and the reads overlap. Summaries are yielded in walk
+    order.
+
+    Reports the `walk`, `cache`, `read` and `parse` phases, as time spent in each.
+    """
+    # every file walked but not yet yielded, with its cached summary if any
+    entries: Deque[Tuple[Path, os.stat_result, Optional[FileSummary]]] = deque()
+    walk_seconds = 0.0
+    cache_seconds = 0.0
+    hits = 0
+
+    def misses() -> Iterator[Path]:
+        nonlocal walk_seconds, cache_seconds, hits
+        walked = iter(path_stats)
+        while True:
+            start = time.perf_counter()
+            path_stat = next(walked, None)
+            walked_at = time.perf_counter()
+            walk_seconds += walked_at - start
+            if path_stat is None:
+                return
+            path, st = path_stat
+            summary = None
+            if cache is not None:
+                summary = cache.get(str(path.relative_to(base_dir)), path, st)
+                cache_seconds += time.perf_counter() - walked_at
+            entries.append((path, st, summary))
+            if summary is None:
+                yield path
+            else:
+                hits += 1
+
+    read_seconds = 0.0
+    parse_seconds = 0.0
+    parsed = 0
+    start = time.perf_counter()
+    for path, data in prefetch_contents(misses(), prefetch):
+        read_done = time.perf_counter()
+        while True:
+            walked_path, st, summary = entries.popleft()
+            if summary is None:
+                break
+            yield walked_path, summary
+        imports, metadata = summarize_bytes(data, base_dir, path, top_level_only)
+        if cache is not None:
+            key = str(path.relative_to(base_dir))
+            cache.put(key, st, content_digest(data), imports, metadata)
+        parsed += 1
+        yield path, (imports, metadata)
+        read_seconds += read_done - start
+        start = time.perf_counter()
+        parse_seconds += start - read_done
+    for path, _, summary in entries:
+        assert summary is not None
+        yield path, summary
+
+    if PHASE_HOOKS:
+        # the walk overlaps the reads, so its time is how long was spent waiting on it
+        report_phase("walk", walk_seconds, files=parsed + hits)
+        if cache is not None:
+            report_phase("cache", cache_seconds, files=parsed + hits, hits=hits)
+        report_phase("read", read_seconds, parsed, files=parsed)
+        report_phase("parse", parse_seconds, parsed, files=parsed)
+
+
 def build_parse_summary(
-    base_dir: Path, excluded_paths: List[Path], top_level_only: bool
+    base_dir: Path,
+    excluded_paths: List[Path],
+    top_level_only: bool,
+    cache: Optional[ParseCache] = None,
+    jobs: int = 1,
+    prefetch: int = 0,
 ) -> ParseSummary:
     path_edges: List[Edge] = []
     mod_to_path: Dict[str, str] = {}
     node_to_metadata: Dict[str, FileMetadata] = {}
 
+    summarized: Iterable[Tuple[Path, FileSummary]]
+    if jobs == 1 and prefetch > 0:
+        summarized = summarize_walk_prefetch(
+            python_file_stats(base_dir, excluded_paths),
+            base_dir,
+            top_level_only,
+            cache,
+            prefetch,
+        )
+    else:
+        with phase("walk") as counts:
+            path_stats = list(python_file_stats(base_dir, excluded_paths))
+            counts["files"] = len(path_stats)
+        paths = [path for path, st in path_stats]
+        stats = [st for path, st in path_stats]
+        summaries = summarize_paths(
+            paths, base_dir, top_level_only, cache, jobs, stats, prefetch
+        )
+        summarized = zip(paths, summaries)
+
     mod_edges: List[Edge] = []
-    cre = re.compile(r"^# Package: (.+)$", re.MULTILINE)
-    for path in python_files(base_dir, excluded_paths):
+    for path, (imports, metadata) in summarized:
         src_mod = path_to_mod(path, base_dir)
-        src_path_str = str(path.relative_to(base_dir))
+        src_path_str = sys.intern(str(path.relative_to(base_dir)))
         mod_to_path[src_mod] = src_path_str
-        filestring = path.read_text()
-        line_count = len(filestring.split("\n"))
-        inline_package = None
-        for imp_mod in mods_imported_for_python_file(
-            filestring, base_dir, path, top_level_only
-        ):
+        for imp_mod in imports:
             mod_edges.append((src_mod, imp_mod))
-        result = cre.search(filestring)
-        if result:
-            inline_package = result.group(1).strip()
-        node_to_metadata[src_path_str] = FileMetadata(line_count, inline_package)
+        node_to_metadata[src_path_str] = metadata
+
+    if cache is not None:
+        cache.prune(set(node_to_metadata))
+        cache.save()
 
-    path_edges, reverse_lookup = remap_edges(mod_edges, mod_to_path)
+    with phase("remap_edges", imports=len(mod_edges)) as counts:
+        path_edges, _ = remap_edges(mod_edges, mod_to_path)
+        counts["edges"] = len(path_edges)
+    nodes = sorted(mod_to_path.values())
     parse_summary = ParseSummary(
-        nodes=sorted(mod_to_path.values()),
-        edges=path_edges,
+        nodes=nodes,
+        edges=EdgeList.from_edges(path_edges, nodes),
         node_to_metadata=node_to_metadata,
     )
     return parse_summary
+
+
+class ParseState:
+    """
+    An in-memory parse of a directory that can be refreshed incrementally.
+
+    `refresh` only re-parses files whose mtime or size changed, and only the edges
+    incident to the modules of those files are patched in the sorted edge list.
+    Each of `listeners` is then called with the nodes and the edges that were added
+    (1) or removed (-1), so state derived from the graph can be patched too.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path,
+        excluded_paths: List[Path],
+        top_level_only: bool,
+        cache: Optional[ParseCache] = None,
+        jobs: int = 1,
+        prefetch: int = 0,
+    ):
+        self.base_dir = base_dir
+        self.excluded_paths = excluded_paths
+        self.top_level_only = top_level_only
+        self.cache = cache
+        self.jobs = jobs
+        self.prefetch = prefetch
+        # path -> (mtime_ns, size, mod, imports, metadata), in walk order
+        self.files: Dict[str, Tuple[int, int, str, List[str], FileMetadata]] = {}
+        self.mod_to_path: Dict[str, str] = {}
+        self.mod_imports: Dict[str, List[str]] = {}
+        self.importers: Dict[str, Set[str]] = {}
+        self.nodes: List[str] = []
+        self.edges: List[Edge] = []
+        self.edge_counts: Dict[Edge, int] = {}
+        self.listeners: List[GraphListener] = []
+        self._node_changes: Dict[str, int] = {}
+        self._edge_changes: Dict[Edge, int] = {}
+        self.refresh()
+
+    def summary(self) -> ParseSummary:
+        return ParseSummary(
+            nodes=list(self.nodes),
+            edges=list(self.edges),
+            node_to_metadata={k: v[4] for k, v in self.files.items()},
+        )
+
+    def refresh(self) -> List[str]:
+        """
+        Re-scan the directory and apply all changes since the last scan. Returns the
+        sorted list of changed, added and deleted paths.
+
+        The scan walks and stats every file, O(files) per call even when nothing
+        changed; only the parsing and patching are proportional to the changes.
+        """
+        seen: Dict[str, os.stat_result] = {}
+        changed: List[Path] = []
+        changed_stats: List[os.stat_result] = []
+        with phase("walk") as counts:
+            for path, st in python_file_stats(self.base_dir, self.excluded_paths):
+                path_str = str(path.relative_to(self.base_dir))
+                seen[path_str] = st
+                entry = self.files.get(path_str)
+                if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+                    changed.append(path)
+                    changed_stats.append(st)
+            counts["files"] = len(seen)
+        deleted = [k for k in self.files if k not in seen]
+        if not changed and not deleted:
+            return []
+
+        # parse everything before touching any state, so a file that fails to parse
+        # leaves the previous state intact and is retried on the next refresh
+        summaries = summarize_paths(
+            changed,
+            self.base_dir,
+            self.top_level_only,
+            self.cache,
+            self.jobs,
+            changed_stats,
+            self.prefetch,
+        )
+        updates = {}
+        for path, (imports, metadata) in zip(changed, summaries):
+            path_str = str(path.relative_to(self.base_dir))
+            st = seen[path_str]
+            mod = path_to_mod(path, self.base_dir)
+            updates[path_str] = (st.st_mtime_ns, st.st_size, mod, imports, metadata)
+
+        with phase("patch", files=len(updates) + len(deleted)):
+            touched = set(self.files[k][2] for k in deleted)
+            touched.update(self.files[k][2] for k in updates if k in self.files)
+            touched.update(v[2] for v in updates.values())
+            for mod in touched:
+                if mod in self.mod_to_path:
+                    self._remove_mod(mod)
+
+            old_files = self.files
+            self.files = {k: updates.get(k) or old_files[k] for k in seen}
+            mod_paths: Dict[str, List[str]] = {mod: [] for mod in touched}
+            for path_str, (_, _, mod, _, _) in self.files.items():
+                if mod in mod_paths:
+                    mod_paths[mod].append(path_str)
+            for mod, path_strs in mod_paths.items():
+                if path_strs:
+                    self._add_mod(mod, path_strs)
+            node_changes, self._node_changes = self._node_changes, {}
+            edge_changes, self._edge_changes = self._edge_changes, {}
+            for listener in self.listeners:
+                listener(node_changes, edge_changes)
+
+        if self.cache is not None:
+            self.cache.prune(set(self.files))
+            self.cache.save()
+        return sorted(deleted + list(updates))
+
+    @staticmethod
+    def _record(changes: Dict[Any, int], key: Any, delta: int) -> None:
+        # an edge removed and added back in one refresh didn't change
+        total = changes.get(key, 0) + delta
+        if total:
+            changes[key] = total
+        else:
+            del changes[key]
+
+    def _add_edge(self, edge: Edge, count: int = 1) -> None:
+        if edge[0] == edge[1]:
+            return
+        prior = self.edge_counts.get(edge, 0)
+        self.edge_counts[edge] = prior + count
+        if prior == 0:
+            bisect.insort(self.edges, edge)
+            self._record(self._edge_changes, edge, 1)
+
+    def _remove_edge(self, edge: Edge, count: int = 1) -> None:
+        if edge[0] == edge[1]:
+            return
+        remaining = self.edge_counts[edge] - count
+        if remaining > 0:
+            self.edge_counts[edge] = remaining
+            return
+        del self.edge_counts[edge]
+        del self.edges[bisect.bisect_left(self.edges, edge)]
+        self._record(self._edge_changes, edge, -1)
+
+    def _add_mod(self, mod: str, path_strs: List[str]) -> None:
+        """
+        Add the module `mod` defined by `path_strs`. As in `build_parse_summary`, the
+        last of several files for one module (eg. `a.py` and `a/__init__.py`) is its
+        node, and the imports of all of them are attributed to it.
+        """
+        path_str = path_strs[-1]
+        imports = [imp for p in path_strs for imp in self.files[p][3]]
+        self.mod_to_path[mod] = path_str
+        self.mod_imports[mod] = imports
+        bisect.insort(self.nodes, path_str)
+        self._record(self._node_changes, path_str, 1)
+        for imp_mod in imports:
+            self.importers.setdefault(imp_mod, set()).add(mod)
+            if imp_mod in self.mod_to_path:
+                self._add_edge((path_str, self.mod_to_path[imp_mod]))
+        for src_mod in self.importers.get(mod, ()):
+            if src_mod != mod:
+                count = self.mod_imports[src_mod].count(mod)
+                self._add_edge((self.mod_to_path[src_mod], path_str), count)
+
+    def _remove_mod(self, mod: str) -> None:
+        path_str = self.mod_to_path[mod]
+        for src_mod in self.importers.get(mod, ()):
+            if src_mod != mod:
+                count = self.mod_imports[src_mod].count(mod)
+                self._remove_edge((self.mod_to_path[src_mod], path_str), count)
+        for imp_mod in self.mod_imports.pop(mod):
+            importers = self.importers.get(imp_mod)
+            if importers is not None:
+                importers.discard(mod)
+                if not importers:
+                    del self.importers[imp_mod]
+            if imp_mod in self.mod_to_path:
+                self._remove_edge((path_str, self.mod_to_path[imp_mod]))
+        del self.mod_to_path[mod]
+        del self.nodes[bisect.bisect_left(self.nodes, path_str)]
+        self._record(self._node_changes, path_str, -1)
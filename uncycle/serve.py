@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, List, Optional
+
+import json
+import os
+import socketserver
+import threading
+
+from .config import Config
+from .graph import Graph, leaf_nodes, shortest_cycles, shortest_path
+from .parse_summary import ParseState, ParseSummary
+
+
+class QueryError(Exception):
+    pass
+
+
+class QueryIndex:
+    """
+    The indexes answering server queries, built once per parse. Results that need a
+    whole-graph computation, like the leafs or the cycles, are computed on first use
+    and kept until the next reload.
+    """
+
+    def __init__(self, summary: ParseSummary, package_contents: Dict[str, List[str]]):
+        self.summary = summary
+        self.graph = Graph.from_edges(summary.edges, summary.nodes)
+        self.package_map: Dict[str, str] = {}
+        for package, paths in package_contents.items():
+            for path in paths:
+                self.package_map[path] = package
+        self._memo: Dict[str, Any] = {}
+
+    def node(self, name: Any) -> int:
+        node = self.graph.ids.get(name) if isinstance(name, str) else None
+        if node is None:
+            raise QueryError(f"unknown node: {name!r}")
+        return node
+
+    def names(self, nodes: Any) -> List[str]:
+        return [self.graph.names[node] for node in nodes]
+
+    def memo(self, key: str, f: Callable[[], Any]) -> Any:
+        if key not in self._memo:
+            self._memo[key] = f()
+        return self._memo[key]
+
+    def used_by(self, node: str) -> List[str]:
+        return self.names(self.graph.predecessors(self.node(node)))
+
+    def imports(self, node: str) -> List[str]:
+        return self.names(self.graph.successors(self.node(node)))
+
+    def leafs(self) -> List[str]:
+        # as `print_leafs`, without ignored dependencies
+        def compute() -> List[str]:
+            graph = self.graph.quotient(self.package_map, drop_missing=False)
+            return [graph.names[node] for node in leaf_nodes(graph)]
+
+        return self.memo("leafs", compute)
+
+    def package_graph(self) -> Dict[str, List[str]]:
+        # as `print_virtual_dependency_graph`
+        def compute() -> Dict[str, List[str]]:
+            path_to_package = self.summary.path_to_package()
+            return self.graph.quotient(path_to_package).adjacency_list()
+
+        return self.memo("package_graph", compute)
+
+    def cycles(self) -> List[List[str]]:
+        # as `print_cycles`, at file level
+        def compute() -> List[List[str]]:
+            cycles, _ = shortest_cycles(self.graph)
+            return [self.names(cycle) for cycle in cycles]
+
+        return self.memo("cycles", compute)
+
+    def path(self, src: str, dst: str) -> List[str]:
+        return self.names(shortest_path(self.graph, self.node(src), self.node(dst)))
+
+
+class QueryServer:
+    """
+    Keeps a parse of the directory and its `QueryIndex` in memory, and answers JSON
+    requests like `{"op": "used_by", "node": "a.py"}` with `{"ok": true, "result":
+    ...}` or `{"ok": false, "error": ...}`.
+
+    Supported ops are `used_by`, `imports`, `leafs`, `package_graph`, `cycles`,
+    `path` (with `src` and `dst`) and `reload`, which re-parses changed files only.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.state = ParseState(
+            config.dir_path,
+            config.excluded_paths,
+            config.top_level_only,
+            cache=config.cache,
+            jobs=config.jobs,
+            prefetch=config.prefetch,
+        )
+        self.index = QueryIndex(self.state.summary(), config.package_contents)
+
+    def reload(self) -> List[str]:
+        changed = self.state.refresh()
+        if changed:
+            self.index = QueryIndex(self.state.summary(), self.config.package_contents)
+        return changed
+
+    def query(self, request: Dict[str, Any]) -> Any:
+        op = request.get("op")
+        index = self.index
+        if op == "used_by":
+            return index.used_by(request.get("node"))
+        if op == "imports":
+            return index.imports(request.get("node"))
+        if op == "leafs":
+            return index.leafs()
+        if op == "package_graph":
+            return index.package_graph()
+        if op == "cycles":
+            return index.cycles()
+        if op == "path":
+            return index.path(request.get("src"), request.get("dst"))
+        if op == "reload":
+            return self.reload()
+        raise QueryError(f"unknown op: {op!r}")
+
+    def handle_line(self, line: str) -> str:
+        request = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise QueryError("request must be a JSON object")
+            with self.lock:
+                response = {"ok": True, "result": self.query(request)}
+        except (QueryError, ValueError, OSError, SyntaxError) as ex:
+            response = {"ok": False, "error": str(ex)}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return json.dumps(response)
+
+
+def serve_stream(server: QueryServer, infile: IO[str], outfile: IO[str]) -> None:
+    """
+    Answer one JSON request per line of `infile` until it's closed.
+    """
+    for line in infile:
+        if not line.strip():
+            continue
+        outfile.write(server.handle_line(line) + "\n")
+        outfile.flush()
+
+
+class _StreamHandler(socketserver.StreamRequestHandler):
+    server: "_UnixServer"
+
+    def handle(self) -> None:
+        for raw in self.rfile:
+            line = raw.decode("utf8")
+            if not line.strip():
+                continue
+            response = self.server.query_server.handle_line(line)
+            self.wfile.write(response.encode("utf8") + b"\n")
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, query_server: QueryServer):
+        self.query_server = query_server
+        super().__init__(socket_path, _StreamHandler)
+
+
+def serve_socket(
+    server: QueryServer,
+    socket_path: Path,
+    ready: Optional[Callable[[], None]] = None,
+) -> None:
+    """
+    Answer JSON requests, one per line, from any number of clients connecting to the
+    Unix socket at `socket_path`, until interrupted.
+    """
+    if socket_path.exists():
+        os.unlink(socket_path)
+    with _UnixServer(str(socket_path), server) as unix_server:
+        if ready is not None:
+            ready()
+        try:
+            unix_server.serve_forever()
+        finally:
+            os.unlink(socket_path)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Set
+
+import struct
+import sys
+
+from .edge import Edge, EdgeList
+from .file_metadata import FileMetadata
+from .graph import Graph, is_cyclic_component, strongly_connected_components
+from .parse_summary import ParseSummary
+
+
+SNAPSHOT_MAGIC = b"UNCYCLE\0"
+SNAPSHOT_VERSION = 1
+
+# magic, version, string count, string table size, node count, edge count and
+# metadata count
+HEADER = struct.Struct("<8sIIIIII")
+
+
+def _pack(values: List[int], typecode: str = "I") -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(data: memoryview, offset: int, count: int, typecode: str = "I") -> array:
+    unpacked = array(typecode)
+    unpacked.frombytes(data[offset : offset + count * unpacked.itemsize])
+    if sys.byteorder == "big":
+        unpacked.byteswap()
+    return unpacked
+
+
+def dump_snapshot(summary: ParseSummary) -> bytes:
+    """
+    Serialize a `ParseSummary` into the snapshot format: a header, a table of all
+    distinct strings (NUL-separated UTF-8), then packed little-endian arrays of string
+    indices for the nodes, the edge sources and destinations, and the metadata paths,
+    line counts and inline packages (-1 for none), in `node_to_metadata` order.
+    """
+    strings: Dict[str, int] = {}
+
+    def intern(s: str) -> int:
+        idx = strings.get(s)
+        if idx is None:
+            idx = strings[s] = len(strings)
+        return idx
+
+    nodes = [intern(node) for node in summary.nodes]
+    srcs = [intern(src) for src, dst in summary.edges]
+    dsts = [intern(dst) for src, dst in summary.edges]
+    md_paths = []
+    md_line_counts = []
+    md_packages = []
+    for path, md in summary.node_to_metadata.items():
+        md_paths.append(intern(path))
+        md_line_counts.append(md.line_count)
+        package = md.inline_package
+        md_packages.append(-1 if package is None else intern(package))
+
+    table = "\0".join(strings).encode("utf8")
+    header = HEADER.pack(
+        SNAPSHOT_MAGIC,
+        SNAPSHOT_VERSION,
+        len(strings),
+        len(table),
+        len(nodes),
+        len(srcs),
+        len(md_paths),
+    )
+    return b"".join(
+        [
+            header,
+            table,
+            _pack(nodes),
+            _pack(srcs),
+            _pack(dsts),
+            _pack(md_paths),
+            _pack(md_line_counts),
+            _pack(md_packages, "i"),
+        ]
+    )
+
+
+def load_snapshot(data: bytes) -> ParseSummary:
+    if len(data) < HEADER.size:
+        raise ValueError("not an uncycle snapshot")
+    magic, version, string_count, table_size, node_count, edge_count, md_count = (
+        HEADER.unpack_from(data)
+    )
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("not an uncycle snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"unsupported snapshot version {version}")
+    expected_size = (
+        HEADER.size + table_size + 4 * (node_count + 2 * edge_count + 3 * md_count)
+    )
+    if len(data) != expected_size:
+        raise ValueError("truncated or corrupt snapshot")
+
+    view = memoryview(data)
+    offset = HEADER.size
+    table = view[offset : offset + table_size].tobytes().decode("utf8")
+    strings = [sys.intern(s) for s in table.split("\0")] if string_count else []
+    if len(strings) != string_count:
+        raise ValueError("truncated or corrupt snapshot")
+    offset += table_size
+    sections = []
+    for count, typecode in [
+        (node_count, "I"),
+        (edge_count, "I"),
+        (edge_count, "I"),
+        (md_count, "I"),
+        (md_count, "I"),
+        (md_count, "i"),
+    ]:
+        sections.append(_unpack(view, offset, count, typecode))
+        offset += 4 * count
+    nodes, srcs, dsts, md_paths, md_line_counts, md_packages = sections
+    for indices in (nodes, srcs, dsts, md_paths, md_packages):
+        if max(indices, default=-1) >= string_count:
+            raise ValueError("truncated or corrupt snapshot")
+
+    return ParseSummary(
+        nodes=[strings[idx] for idx in nodes],
+        edges=EdgeList(strings, srcs, dsts),
+        node_to_metadata={
+            strings[path]: FileMetadata(
+                line_count, None if package < 0 else strings[package]
+            )
+            for path, line_count, package in zip(md_paths, md_line_counts, md_packages)
+        },
+    )
+
+
+def write_snapshot(summary: ParseSummary, path: Path) -> None:
+    path.write_bytes(dump_snapshot(summary))
+
+
+def read_snapshot(path: Path) -> ParseSummary:
+    return load_snapshot(path.read_bytes())
+
+
+@dataclass(frozen=True)
+class SnapshotDiff:
+    added_edges: List[Edge]
+    removed_edges: List[Edge]
+    # cyclic strongly connected components of the new graph not in the old one
+    new_sccs: List[List[str]]
+    added_package_edges: List[Edge]
+    removed_package_edges: List[Edge]
+
+
+def cyclic_sccs(graph: Graph) -> Set[FrozenSet[str]]:
+    return set(
+        frozenset(graph.names[node] for node in scc)
+        for scc in strongly_connected_components(graph)
+        if is_cyclic_component(graph, scc)
+    )
+
+
+def diff_summaries(
+    old: ParseSummary,
+    new: ParseSummary,
+    old_package_map: Dict[str, str],
+    new_package_map: Dict[str, str],
+) -> SnapshotDiff:
+    old_edges = set(old.edges)
+    new_edges = set(new.edges)
+    old_graph = Graph.from_edges(old.edges, old.nodes)
+    new_graph = Graph.from_edges(new.edges, new.nodes)
+    new_sccs = cyclic_sccs(new_graph) - cyclic_sccs(old_graph)
+    old_package_edges = set(old_graph.quotient(old_package_map).edges())
+    new_package_edges = set(new_graph.quotient(new_package_map).edges())
+    return SnapshotDiff(
+        added_edges=sorted(new_edges - old_edges),
+        removed_edges=sorted(old_edges - new_edges),
+        new_sccs=sorted((sorted(scc) for scc in new_sccs), key=lambda x: (len(x), x)),
+        added_package_edges=sorted(new_package_edges - old_package_edges),
+        removed_package_edges=sorted(old_package_edges - new_package_edges),
+    )
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+from .edge import EdgeList
+from .graph import Graph, order_components
+
+
+def _to_array(values: np.ndarray) -> array:
+    result = array("i")
+    result.frombytes(values.astype(np.intc).tobytes())
+    return result
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    # `np.unique` hashes before sorting, which is several times slower here
+    values = np.sort(values)
+    first = np.ones(len(values), dtype=bool)
+    np.not_equal(values[1:], values[:-1], out=first[1:])
+    return values[first]
+
+
+def _csr(n: int, codes: np.ndarray) -> Tuple[array, array]:
+    # as `Graph._csr`, for sorted distinct codes `src * n + dst`
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes // n, minlength=n), out=offsets[1:])
+    return _to_array(offsets), _to_array(codes % n)
+
+
+def graph_from_edge_list(edges: EdgeList, nodes: Iterable[str]) -> Graph:
+    """
+    Build the same `Graph` as `Graph.from_edges(edges, nodes)`, sorting and merging
+    the edges as numpy arrays.
+    """
+    srcs = np.frombuffer(edges.srcs, dtype=np.uintc)
+    dsts = np.frombuffer(edges.dsts, dtype=np.uintc)
+    is_used = np.zeros(len(edges.names), dtype=bool)
+    is_used[srcs] = True
+    is_used[dsts] = True
+    used = np.flatnonzero(is_used).tolist()
+    names_set = set(nodes)
+    names_set.update(edges.names[idx] for idx in used)
+    names = sorted(names_set)
+    ids = {name: idx for idx, name in enumerate(names)}
+    remap = np.zeros(len(edges.names), dtype=np.int64)
+    remap[used] = [ids[edges.names[idx]] for idx in used]
+    n = len(names)
+    codes = _sorted_unique(remap[srcs] * n + remap[dsts])
+    offsets, targets = _csr(n, codes)
+    rev_offsets, sources = _csr(n, np.sort(codes % n * n + codes // n))
+    return Graph.from_csr(names, offsets, targets, rev_offsets, sources)
+
+
+def adjacency_matrix(graph: Graph) -> csr_matrix:
+    """
+    Return the adjacency matrix of `graph`, sharing its buffers.
+    """
+    n = len(graph)
+    targets = np.frombuffer(graph.targets, dtype=np.intc)
+    offsets = np.frombuffer(graph.offsets, dtype=np.intc)
+    data = np.ones(len(targets), dtype=np.int8)
+    return csr_matrix((data, targets, offsets), shape=(n, n))
+
+
+def degrees(graph: Graph) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the in- and out-degree of every node.
+    """
+    in_degrees = np.diff(np.frombuffer(graph.rev_offsets, dtype=np.intc))
+    out_degrees = np.diff(np.frombuffer(graph.offsets, dtype=np.intc))
+    return in_degrees, out_degrees
+
+
+def strongly_connected_components(
+    graph: Graph, canonical: bool = False
+) -> Optional[List[List[int]]]:
+    """
+    As `uncycle.graph.strongly_connected_components` for the whole graph, or `None`
+    if scipy didn't number the components in reverse topological order. That order
+    varies between scipy versions; with `canonical`, the edges between components
+    are merged with numpy to find the heights for `order_components`.
+    """
+    n = len(graph)
+    if n == 0:
+        return []
+    count, labels = connected_components(
+        adjacency_matrix(graph), directed=True, connection="strong"
+    )
+    _, out_degrees = degrees(graph)
+    srcs = np.repeat(np.arange(n), out_degrees)
+    dsts = np.frombuffer(graph.targets, dtype=np.intc)
+    src_labels = labels[srcs].astype(np.int64)
+    dst_labels = labels[dsts]
+    if np.any(src_labels < dst_labels):
+        return None
+    # members of each component, in increasing order
+    nodes = np.argsort(labels, kind="stable").tolist()
+    bounds = np.cumsum(np.bincount(labels, minlength=count)).tolist()
+    sccs = [nodes[lo:hi] for lo, hi in zip([0, *bounds], bounds)]
+    if not canonical:
+        return sccs
+
+    # heights over the condensation, whose edges go to lower labels
+    between = src_labels != dst_labels
+    codes = _sorted_unique(src_labels[between] * count + dst_labels[between])
+    offsets, targets = _csr(count, codes)
+    heights: List[int] = []
+    height_of = heights.__getitem__
+    for label in range(count):
+        below = targets[offsets[label] : offsets[label + 1]]
+        heights.append(max(map(height_of, below), default=-1) + 1)
+    return order_components(sccs, heights)
+
+
+def leaf_nodes(graph: Graph, ignored: Iterable[int] = ()) -> List[int]:
+    """
+    As `uncycle.graph.leaf_nodes`.
+    """
+    keep = np.ones(len(graph), dtype=np.int32)
+    keep[list(ignored)] = 0
+    remaining = adjacency_matrix(graph) @ keep
+    in_degrees, _ = degrees(graph)
+    return np.flatnonzero((in_degrees > 0) & (remaining == 0)).tolist()
+
+
+def reachable(graph: Graph, nodes: Iterable[int], reverse: bool = False) -> List[int]:
+    """
+    As `uncycle.graph.reachable`: a breadth-first search from an extra node with an
+    edge to every successor of `nodes`.
+    """
+    if reverse:
+        graph = graph.reversed()
+    n = len(graph)
+    matrix = adjacency_matrix(graph)
+    starts = matrix[list(nodes)].indices
+    offsets = np.append(matrix.indptr, matrix.indptr[-1] + len(starts))
+    targets = np.concatenate([matrix.indices, starts])
+    data = np.ones(len(targets), dtype=np.int8)
+    extended = csr_matrix((data, targets, offsets), shape=(n + 1, n + 1))
+    order = breadth_first_order(extended, n, directed=True, return_predecessors=False)
+    return np.sort(order[1:]).tolist()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import fnmatch
+import os
+
+
+WALK_THREADS = 8
+
+GLOB_CHARS = frozenset("*?[")
+
+
+class _TrieNode:
+    __slots__ = ("children", "globs", "any_depth", "recursive", "terminal")
+
+    def __init__(self) -> None:
+        self.children: Dict[str, _TrieNode] = {}
+        self.globs: List[Tuple[str, _TrieNode]] = []
+        # the node reached through a `**` component, which matches any number of
+        # path components, including none
+        self.any_depth: Optional[_TrieNode] = None
+        self.recursive = False
+        self.terminal = False
+
+
+State = Tuple[_TrieNode, ...]
+
+
+def _closure(node: _TrieNode) -> List[_TrieNode]:
+    nodes = [node]
+    while node.any_depth is not None:
+        node = node.any_depth
+        nodes.append(node)
+    return nodes
+
+
+class ExclusionMatcher:
+    """
+    A set of excluded paths, relative to `root`, compiled into a prefix trie of path
+    components. Components may be `fnmatch` globs, and `**` matches any number of
+    components. A path is excluded if it or any of its parents matches.
+
+    Matching is incremental: `step` advances a state by one path component, so a
+    directory walk matches each entry in time independent of the pattern count.
+    """
+
+    def __init__(self, patterns: Iterable[Path | str], root: Path):
+        self.root = root
+        self._root_node = _TrieNode()
+        self.is_empty = True
+        root_str = str(root)
+        for pattern in patterns:
+            pattern_str = os.path.normpath(os.path.join(root_str, pattern))
+            rel = os.path.relpath(pattern_str, root_str)
+            if rel == os.curdir or rel.split(os.sep, 1)[0] == os.pardir:
+                continue
+            self._add(rel.split(os.sep))
+
+    def _add(self, parts: List[str]) -> None:
+        node = self._root_node
+        for part in parts:
+            if part == "**":
+                if node.any_depth is None:
+                    node.any_depth = _TrieNode()
+                    node.any_depth.recursive = True
+                node = node.any_depth
+            elif GLOB_CHARS.intersection(part):
+                for glob, child in node.globs:
+                    if glob == part:
+                        break
+                else:
+                    child = _TrieNode()
+                    node.globs.append((part, child))
+                node = child
+            else:
+                node = node.children.setdefault(part, _TrieNode())
+        node.terminal = True
+        self.is_empty = False
+
+    def initial_state(self) -> State:
+        return tuple(_closure(self._root_node))
+
+    def step(self, state: State, name: str) -> Optional[State]:
+        """
+        Advance `state` by the path component `name`. Returns `None` if the path is
+        excluded.
+        """
+        next_nodes: List[_TrieNode] = []
+        for node in state:
+            child = node.children.get(name)
+            if child is not None:
+                next_nodes.extend(_closure(child))
+            for glob, child in node.globs:
+                if fnmatch.fnmatchcase(name, glob):
+                    next_nodes.extend(_closure(child))
+            if node.recursive:
+                next_nodes.append(node)
+        for node in next_nodes:
+            if node.terminal:
+                return None
+        return tuple(next_nodes)
+
+    def matches(self, path: Path | str) -> bool:
+        """
+        Return whether `path`, either absolute or relative to the root, is excluded.
+        """
+        if self.is_empty:
+            return False
+        path_str = str(path)
+        if os.path.isabs(path_str):
+            path_str = os.path.relpath(path_str, self.root)
+        parts = os.path.normpath(path_str).split(os.sep)
+        if parts[0] == os.pardir:
+            return False
+        state = self.initial_state()
+        for part in parts:
+            if part == os.curdir:
+                continue
+            next_state = self.step(state, part)
+            if next_state is None:
+                return True
+            state = next_state
+        return False
+
+
+def is_python_file(name: str) -> bool:
+    # the same test as `Path(name).suffix == ".py"`
+    return name.endswith(".py") and len(name) > 3
+
+
+def _scan_dir(
+    path: str, matcher: ExclusionMatcher, state: State
+) -> Tuple[List[Tuple[str, os.stat_result]], List[Tuple[str, State]]]:
+    """
+    List the non-empty, non-excluded python files and the non-excluded
+    subdirectories of `path`, in `os.scandir` order.
+    """
+    files: List[Tuple[str, os.stat_result]] = []
+    dirs: List[Tuple[str, State]] = []
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        return files, dirs
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+        except OSError:
+            is_dir = False
+        if not is_dir and not is_python_file(entry.name):
+            continue
+        child_state = matcher.step(state, entry.name)
+        if child_state is None:
+            continue
+        if is_dir:
+            dirs.append((entry.path, child_state))
+            continue
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        if st.st_size > 0:
+            files.append((entry.path, st))
+    return files, dirs
+
+
+def walk_python_files(
+    base_dir: Path, matcher: ExclusionMatcher, threads: int = WALK_THREADS
+) -> Iterator[Tuple[Path, os.stat_result]]:
+    """
+    Yield each non-empty, non-excluded python file under `base_dir` along with its
+    stat result, in the same order as a top-down `Path.walk`.
+
+    With `threads > 1`, directories are listed concurrently in a thread pool, which
+    hides latency on network file systems. Every subdirectory is queued as soon as
+    its parent is listed, and results are consumed in walk order.
+    """
+    if threads <= 1:
+        stack = [(str(base_dir), matcher.initial_state())]
+        while stack:
+            path_str, state = stack.pop()
+            files, dirs = _scan_dir(path_str, matcher, state)
+            for file_path, st in files:
+                yield Path(file_path), st
+            stack.extend(reversed(dirs))
+        return
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+
+        def submit(path: str, state: State) -> Future:
+            return executor.submit(_scan_dir, path, matcher, state)
+
+        future_stack = [submit(str(base_dir), matcher.initial_state())]
+        while future_stack:
+            files, dirs = future_stack.pop().result()
+            for file_path, st in files:
+                yield Path(file_path), st
+            future_stack.extend(reversed([submit(*d) for d in dirs]))